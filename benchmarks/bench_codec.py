@@ -0,0 +1,72 @@
+"""Разбор записанных запросов Алисы и сериализация ответов для каждого доступного JSON-бэкенда.
+
+    python benchmarks/bench_codec.py [--repeat 20000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from alice_skill import codec  # noqa: E402
+
+PAYLOADS = os.path.join(os.path.dirname(__file__), 'payloads', 'alice_requests.jsonl')
+
+RESPONSE = {
+    'response': {
+        'text': 'Сколько лет назад зародилось виноделие?',
+        'tts': 'Сколько лет назад зародилось виноделие?',
+        'buttons': [{'title': title, 'hide': True} for title in ('7000', '5000', '10000', 'Выбрать тематику')],
+    },
+    'version': '1.0',
+    'session_state': {'scene': 'Quiz', 'screen': 'quiz', 'quiz': ['история', 1880297215, 1]},
+}
+
+
+def flask_path(bodies):
+    # Как раньше: request.json (get_data + decode + json.loads) и jsonify со стандартным json
+    for body in bodies:
+        json.loads(body.decode('utf-8'))
+        json.dumps(RESPONSE, separators=(',', ':')).encode('utf-8')
+
+
+def codec_path(loads, dumps):
+    def run(bodies):
+        for body in bodies:
+            loads(body)
+            dumps(RESPONSE)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20000)
+    args = parser.parse_args()
+
+    with open(PAYLOADS, 'rb') as f:
+        bodies = [line.rstrip(b'\n') for line in f if line.strip()]
+    rounds = max(1, args.repeat // len(bodies))
+
+    candidates = [('stdlib (old path)', flask_path)]
+    for name, factory in codec.BACKENDS.items():
+        try:
+            _, loads, dumps = factory()
+        except ImportError:
+            print(f'{name}: not installed')
+            continue
+        candidates.append((name, codec_path(loads, dumps)))
+
+    print(f'default backend: {codec.BACKEND}, payloads: {len(bodies)}, '
+          f'avg body: {sum(map(len, bodies)) / len(bodies):.0f} bytes')
+    for name, run in candidates:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            run(bodies)
+        elapsed = (time.perf_counter() - start) / (rounds * len(bodies)) * 1e6
+        print(f'{name:18} {elapsed:8.2f} us/request (decode + encode)')
+
+
+if __name__ == '__main__':
+    main()
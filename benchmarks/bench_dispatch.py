@@ -0,0 +1,78 @@
+"""Стоимость выбора следующей сцены в зависимости от числа сцен и интентов.
+
+Таблица Router против цепочки if/elif, которую раньше писали в handle_*_intents.
+
+    python benchmarks/bench_dispatch.py
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from alice_skill.router import Router  # noqa: E402
+
+
+class FakeRequest:
+    def __init__(self, scene, intents):
+        self.type = 'SimpleUtterance'
+        self.intents = intents
+        self.state = {'scene': scene}
+
+
+def make_scene(name):
+    return type(name, (), {'id': classmethod(lambda cls: cls.__name__)})
+
+
+def build(scene_count, intent_count):
+    router = Router(slot_name='place')
+    scenes = [make_scene(f'Scene{i}') for i in range(scene_count)]
+    for scene in scenes:
+        router.register(scene)
+    intents = [f'intent_{i}' for i in range(intent_count)]
+    for i, intent in enumerate(intents):
+        router.add_route(scenes[i % scene_count], intent=intent)
+    router.compile()
+
+    def chain(scene_id, request_intents):
+        # Линейная проверка: каждый интент по очереди, как в elif-цепочке
+        for i, intent in enumerate(intents):
+            if intent in request_intents:
+                return scenes[i % scene_count]
+    return router, scenes, intents, chain
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=50000)
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    print(f'{"scenes":>7} {"intents":>8} {"router us":>10} {"if/elif us":>11}')
+    for scene_count, intent_count in ((10, 10), (100, 100), (1000, 1000), (100, 10000)):
+        router, scenes, intents, chain = build(scene_count, intent_count)
+        requests = [
+            FakeRequest(f'Scene{rnd.randrange(scene_count)}', {rnd.choice(intents): {'slots': {}}})
+            for _ in range(1000)
+        ]
+        current = [router.scene(request.state['scene']) for request in requests]
+
+        start = time.perf_counter()
+        for i in range(args.repeat):
+            router.move(current[i % 1000], requests[i % 1000])
+        router_us = (time.perf_counter() - start) / args.repeat * 1e6
+
+        repeat = max(100, args.repeat * 10 // intent_count)
+        start = time.perf_counter()
+        for i in range(repeat):
+            request = requests[i % 1000]
+            chain(request.state['scene'], request.intents)
+        chain_us = (time.perf_counter() - start) / repeat * 1e6
+
+        print(f'{scene_count:>7} {intent_count:>8} {router_us:>10.2f} {chain_us:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
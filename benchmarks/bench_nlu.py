@@ -0,0 +1,66 @@
+"""Поиск известных фраз в реплике: автомат Ахо-Корасик против перебора фраз.
+
+    python benchmarks/bench_nlu.py [--phrases 100 1000 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from alice_skill.nlu import Matcher, normalize  # noqa: E402
+
+SYLLABLES = ['ка', 'ро', 'ли', 'на', 'те', 'мо', 'ва', 'ду', 'зе', 'по', 'су', 'ни']
+
+
+def word(rnd):
+    return ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4)))
+
+
+def naive_phrases(phrases, text):
+    # Прежний способ в общем виде: проверить каждую фразу по очереди
+    words = f' {normalize(text)} '
+    return {phrase for phrase in phrases if f' {phrase} ' in words}
+
+
+def measure(fn, utterances):
+    start = time.perf_counter()
+    for text in utterances:
+        fn(text)
+    return (time.perf_counter() - start) / len(utterances) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--phrases', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--utterances', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f'{"phrases":>8} {"build ms":>9} {"naive us":>9} {"automaton us":>13}')
+    for count in args.phrases:
+        rnd = random.Random(args.seed)
+        phrases = sorted({' '.join(word(rnd) for _ in range(rnd.randint(1, 3))) for _ in range(count)})
+        start = time.perf_counter()
+        matcher = Matcher()
+        for i, phrase in enumerate(phrases):
+            matcher.add('answer', i, phrase)
+        matcher.compile()
+        build_ms = (time.perf_counter() - start) * 1000
+        utterances = []
+        for _ in range(args.utterances):
+            parts = [word(rnd) for _ in range(rnd.randint(2, 6))]
+            parts.insert(rnd.randint(0, len(parts)), rnd.choice(phrases).upper())
+            utterances.append(' '.join(parts))
+        for text in utterances[:200]:
+            found = {phrase for _, _, phrase in matcher.phrases(text)}
+            assert found == naive_phrases(phrases, text), text
+        naive_us = measure(lambda text: naive_phrases(phrases, text), utterances[:200])
+        automaton_us = measure(matcher.phrases, utterances)
+        print(f'{count:>8} {build_ms:>9.1f} {naive_us:>9.1f} {automaton_us:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Выбор темы и проверка ответа на синтетическом банке вопросов.
+
+Сравнивает индекс QuizBank с прежним filter() по всем вопросам на каждый выбор темы.
+Ответ проверяется так же, как в навыке: Matcher.is_answer по реплике с ответом внутри.
+
+    python benchmarks/bench_quiz_bank.py [--sizes 1000 10000 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from alice_skill.cursor import QuizCursor  # noqa: E402
+from alice_skill.nlu import build_matcher  # noqa: E402
+from alice_skill.quiz_bank import QuizBank  # noqa: E402
+
+THEMES = ['история', 'места', 'коктейли', 'сервировка']
+
+
+def synthetic_rows(count):
+    for i in range(count):
+        yield THEMES[i % len(THEMES)], f'Вопрос номер {i}?', str(i), (str(i + 1), str(i + 2))
+
+
+def measure(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f'{"questions":>10} {"build ms":>10} {"matcher ms":>11} {"old theme us":>14} {"theme us":>10} '
+          f'{"answer us":>10}')
+    for size in args.sizes:
+        rows = list(synthetic_rows(size))
+        start = time.perf_counter()
+        bank = QuizBank(rows)
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        matcher = build_matcher(bank, venues=[])
+        matcher_ms = (time.perf_counter() - start) * 1000
+        events = {text: [answer, list(wrong), theme] for theme, text, answer, wrong in rows}
+
+        def old_theme(i):
+            command = THEMES[i % len(THEMES)]
+            return list(filter(lambda x: command == events[x][2], events.keys()))
+
+        def new_theme(i):
+            cursor = QuizCursor.start(THEMES[i % len(THEMES)])
+            return bank.question_at(cursor.theme, cursor.index(bank.theme_size(cursor.theme)))
+
+        def answer(i):
+            cursor = QuizCursor(THEMES[i % len(THEMES)], 12345, i)
+            question = bank.question_at(cursor.theme, cursor.index(bank.theme_size(cursor.theme)))
+            return matcher.is_answer(f'наверное {question.answer}', question)
+
+        old_us = measure(old_theme, max(1, args.repeat * 1000 // size))
+        print(f'{size:>10} {build_ms:>10.1f} {matcher_ms:>11.1f} {old_us:>14.1f} '
+              f'{measure(new_theme, args.repeat):>10.2f} {measure(answer, args.repeat):>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Статические ответы: сборка словаря и json.dumps на каждый запрос против готового шаблона.
+Размер ответов: прежний вид (tts дублирует text) против compact и сжатия.
+
+Запускать из корня репозитория: python benchmarks/bench_responses.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+os.chdir(ROOT)
+
+from alice_skill import scenes  # noqa: E402
+from alice_skill.codec import dumps  # noqa: E402
+from alice_skill.content import CONTENT  # noqa: E402
+from alice_skill.responses import COMPRESSORS, compact  # noqa: E402
+
+# Карточки заведений теперь собираются из контента, их размер меряется в sample_responses
+STATIC_SCENES = [scenes.Welcome, scenes.Quest, scenes.Unknown, scenes.NotAllowed]
+
+
+def legacy(webhook_response):
+    # Так отвечал make_response до compact: tts всегда копия text
+    response = dict(webhook_response['response'])
+    response.setdefault('tts', response['text'])
+    return dict(webhook_response, response=response)
+
+
+def old_path(scene):
+    return json.dumps(legacy(type(scene).reply.__wrapped__(scene, None))).encode('utf-8')
+
+
+def new_path(scene):
+    return scene.reply(None)
+
+
+def measure(fn, instances, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for scene in instances:
+            fn(scene)
+    elapsed = (time.perf_counter() - start) / (repeat * len(instances)) * 1e6
+
+    # Пиковый объём временных аллокаций на один ответ
+    tracemalloc.start()
+    peaks = 0
+    for scene in instances:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn(scene)
+        peaks += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return elapsed, peaks / len(instances)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20000)
+    args = parser.parse_args()
+
+    instances = [cls() for cls in STATIC_SCENES]
+    for scene in instances:
+        assert compact(json.loads(old_path(scene))) == json.loads(new_path(scene))
+
+    for name, fn in (('make_response + json.dumps', old_path), ('template', new_path)):
+        us, peak = measure(fn, instances, args.repeat)
+        print(f'{name:28} {us:8.2f} us/response {peak:8.0f} peak bytes allocated/response')
+
+    print()
+    samples = sample_responses()
+    repeat = max(1, args.repeat // 10)
+    variants = [
+        ('legacy', lambda r: dumps(legacy(r))),
+        ('compact', lambda r: dumps(compact(r))),
+    ]
+    for encoding, compress in sorted(COMPRESSORS.items()):
+        variants.append((f'compact + {encoding}', lambda r, compress=compress: compress(dumps(compact(r)))))
+    print(f'{"":28} {"bytes/response":>15} {"us/response":>12}')
+    for name, fn in variants:
+        size = sum(len(fn(r)) for r in samples) / len(samples)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for r in samples:
+                fn(r)
+        us = (time.perf_counter() - start) / (repeat * len(samples)) * 1e6
+        print(f'{name:28} {size:15.0f} {us:12.2f}')
+
+
+def sample_responses():
+    """Ответы с вопросом викторины и с карточкой заведения"""
+    content = CONTENT.get()
+    quiz = scenes.ROUTER.scene('Quiz')
+    samples = []
+    for question in content.quiz_bank.questions:
+        samples.append(quiz.make_response(text=question.text, buttons=quiz._create_buttons(question),
+                                          state={'screen': 'quiz', 'quiz': [question.theme, 12345, 0]}))
+    for venue in content.venues:
+        samples.append({'response': {'text': '', 'tts': venue.tts, 'card': {
+            'type': 'ImageGallery', 'items': [{'image_id': venue.image_id}]}}, 'version': '1.0',
+            'session_state': {'scene': venue.scene}})
+    return [legacy(r) for r in samples]
+
+
+if __name__ == '__main__':
+    main()
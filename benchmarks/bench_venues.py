@@ -0,0 +1,108 @@
+"""Ближайшее заведение: k-d дерево против линейного перебора и кэш по ячейкам геохэша.
+
+Для кэша запросы идут из --hotspots районов (пользователи в одном районе спрашивают
+примерно из одних мест), печатается доля попаданий.
+
+    python benchmarks/bench_venues.py [--venues 10000] [--queries 2000] [--precision 7]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from alice_skill.venues import NearestCache, Venue, VenueIndex, haversine  # noqa: E402
+
+CITIES = [
+    (58.52, 31.27),  # Великий Новгород
+    (59.93, 30.33),  # Санкт-Петербург
+    (55.75, 37.62),  # Москва
+    (56.84, 60.60),  # Екатеринбург
+]
+
+
+def synthetic_venues(count, rnd):
+    venues = []
+    for i in range(count):
+        lat, lon = CITIES[i % len(CITIES)]
+        venues.append(Venue(f'v{i}', 'Zavod', 'city', f'bar {i}',
+                            lat + rnd.uniform(-0.15, 0.15), lon + rnd.uniform(-0.25, 0.25)))
+    return venues
+
+
+def linear_scan(venues, lat, lon):
+    # Прежний способ: плоское евклидово расстояние по градусам до каждого бара
+    distances = {}
+    for venue in venues:
+        distances.update({venue.id: math.sqrt(pow(venue.lat - lat, 2) + pow(venue.lon - lon, 2))})
+    key_list = list(distances.keys())
+    val_list = list(distances.values())
+    return key_list[val_list.index(min(val_list))]
+
+
+def measure(fn, queries):
+    start = time.perf_counter()
+    for lat, lon in queries:
+        fn(lat, lon)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--precision', type=int, default=7)
+    parser.add_argument('--hotspots', type=int, default=200)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    venues = synthetic_venues(args.venues, rnd)
+    start = time.perf_counter()
+    index = VenueIndex(venues)
+    build_ms = (time.perf_counter() - start) * 1000
+    queries = []
+    for i in range(args.queries):
+        lat, lon = CITIES[i % len(CITIES)]
+        queries.append((lat + rnd.uniform(-0.2, 0.2), lon + rnd.uniform(-0.3, 0.3)))
+
+    # Сверка с полным перебором по haversine
+    for lat, lon in queries[:200]:
+        expected = min(venues, key=lambda v: haversine(lat, lon, v.lat, v.lon))
+        assert index.nearest(lat, lon)[0][0] == expected
+
+    print(f'venues: {args.venues}, queries: {args.queries}, build: {build_ms:.1f} ms')
+    print(f'linear scan    : {measure(lambda lat, lon: linear_scan(venues, lat, lon), queries[:200]):10.1f} us/query')
+    print(f'kd nearest k=1 : {measure(lambda lat, lon: index.nearest(lat, lon), queries):10.1f} us/query')
+    print(f'kd nearest k=5 : {measure(lambda lat, lon: index.nearest(lat, lon, k=5), queries):10.1f} us/query')
+    print(f'kd within 500m : {measure(lambda lat, lon: index.within(lat, lon, 500), queries):10.1f} us/query')
+
+    hotspots = []
+    for i in range(args.hotspots):
+        lat, lon = CITIES[i % len(CITIES)]
+        hotspots.append((lat + rnd.uniform(-0.15, 0.15), lon + rnd.uniform(-0.25, 0.25)))
+    local = []
+    for _ in range(args.queries * 10):
+        lat, lon = rnd.choice(hotspots)
+        # разброс около 100 м вокруг района
+        local.append((lat + rnd.gauss(0, 0.0009), lon + rnd.gauss(0, 0.0016)))
+    cache = NearestCache(index, precision=args.precision)
+    for lat, lon in local[:500]:
+        assert cache.nearest(lat, lon)[0] == index.nearest(lat, lon)[0][0]
+    cache = NearestCache(index, precision=args.precision)
+    cached_us = measure(cache.nearest, local)
+    stats = cache.stats()
+    print(f'kd, local      : {measure(lambda lat, lon: index.nearest(lat, lon), local):10.1f} us/query')
+    print(f'cell cache     : {cached_us:10.1f} us/query, hit rate {stats["hit_rate"]:.1%}, cells {stats["size"]}')
+    cache = NearestCache(index, precision=args.precision)
+    lat, lon = CITIES[0]
+    start = time.perf_counter()
+    cells = cache.warm(lat - 0.05, lon - 0.08, lat + 0.05, lon + 0.08)
+    print(f'warm city bbox : {cells} cells in {(time.perf_counter() - start) * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
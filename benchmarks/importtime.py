@@ -0,0 +1,66 @@
+"""Холодный старт: сводка python -X importtime по импорту start и время до первого ответа.
+
+    python benchmarks/importtime.py [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+FIRST_REQUEST = '''
+import json, time
+start_time = time.perf_counter()
+import start
+imported = time.perf_counter()
+body = {"request": {"command": "", "type": "SimpleUtterance", "nlu": {"intents": {}}},
+        "session": {"user_id": "cold-start", "new": True}, "state": {"session": {}}, "version": "1.0"}
+response = start.application.test_client().post("/post", json=body)
+assert response.status_code == 200, response.data
+served = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start_time) * 1000, "first_request_ms": (served - start_time) * 1000}))
+'''
+
+
+def _env():
+    env = dict(os.environ, LOG_LEVEL='WARNING', LOG_REQUEST_BODY='off')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [env.get('PYTHONPATH'), os.path.join(ROOT, 'src')]))
+    return env
+
+
+def importtime(top):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import start'],
+                            cwd=ROOT, env=_env(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    total = max(rows)[0] if rows else 0
+    print(f'import start: {total / 1000:.1f} ms cumulative, {len(rows)} modules')
+    print(f'{"cumulative ms":>14} {"self ms":>8}  module')
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f'{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}')
+
+
+def first_request():
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', FIRST_REQUEST], cwd=ROOT, env=_env(),
+                            capture_output=True, text=True, check=True)
+    wall = (time.perf_counter() - started) * 1000
+    print(f'process start to first response: {wall:.1f} ms ({result.stdout.strip()})')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+    importtime(args.top)
+    first_request()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""Нагрузочный тест вебхука: запросы в секунду и перцентили задержки.
+
+Против уже запущенных серверов:
+    python benchmarks/load_test.py flask=http://127.0.0.1:6666/post asgi=http://127.0.0.1:1337/post
+
+Или поднять оба сервера самостоятельно (нужен uvicorn):
+    python benchmarks/load_test.py --spawn
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def _event(scene=None, command='', type_='SimpleUtterance', state=None):
+    session_state = dict(state or {})
+    if scene is not None:
+        session_state['scene'] = scene
+    return {
+        'request': {'command': command, 'type': type_, 'nlu': {'intents': {}}},
+        'session': {'user_id': 'load-test', 'new': False, 'message_id': 1, 'session_id': 'load-test',
+                    'location': {'lat': 58.5265, 'lon': 31.2795}},
+        'state': {'session': session_state},
+        'version': '1.0',
+    }
+
+
+PAYLOADS = [json.dumps(event).encode('utf-8') for event in (
+    _event(),
+    _event('Quiz', 'история', state={'screen': 'quiz'}),
+    _event('Quiz', 'не знаю', state={'screen': 'quiz', 'quiz': ['история', 12345, 3]}),
+    _event('Zavod', 'что-то непонятное'),
+)]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def run(url, concurrency, duration):
+    parts = urlsplit(url)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(offset):
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+        local = []
+        i = offset
+        while time.perf_counter() < deadline:
+            body = PAYLOADS[i % len(PAYLOADS)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.request('POST', parts.path, body, {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+                ok = False
+            if ok:
+                local.append(time.perf_counter() - start)
+            else:
+                with lock:
+                    errors[0] += 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def wait_ready(url, timeout=20):
+    parts = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=1)
+            conn.request('POST', parts.path, PAYLOADS[0], {'Content-Type': 'application/json'})
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} is not responding')
+
+
+def spawn_servers(flask_port, asgi_port):
+    # все запросы нагрузки идут от одного пользователя с одним message_id: кэш повторов и лимит выключаем
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.environ.get('PYTHONPATH'), 'src'])),
+               IDEMPOTENCY_WINDOW='0', RATE_LIMIT_RATE='0')
+    flask_code = f'import start; start.application.run(host="127.0.0.1", port={flask_port}, threaded=True)'
+    servers = [
+        subprocess.Popen([sys.executable, '-c', flask_code], cwd=ROOT, env=env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        subprocess.Popen([sys.executable, '-m', 'uvicorn', 'asgi:application', '--app-dir', 'src',
+                          '--port', str(asgi_port), '--log-level', 'warning'], cwd=ROOT, env=env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+    ]
+    targets = [('flask', f'http://127.0.0.1:{flask_port}/post'), ('asgi', f'http://127.0.0.1:{asgi_port}/post')]
+    return servers, targets
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('targets', nargs='*', help='name=url')
+    parser.add_argument('--spawn', action='store_true')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    servers = []
+    targets = [tuple(target.split('=', 1)) for target in args.targets]
+    if args.spawn:
+        servers, spawned = spawn_servers(16666, 16667)
+        targets += spawned
+    try:
+        for _, url in targets:
+            wait_ready(url)
+        print(f'{"target":10} {"requests":>9} {"errors":>7} {"rps":>9} {"p50 ms":>8} {"p99 ms":>8}')
+        for name, url in targets:
+            r = run(url, args.concurrency, args.duration)
+            print(f'{name:10} {r["requests"]:>9} {r["errors"]:>7} {r["rps"]:>9.1f} '
+                  f'{r["p50_ms"]:>8.2f} {r["p99_ms"]:>8.2f}')
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
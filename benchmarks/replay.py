@@ -0,0 +1,227 @@
+"""Воспроизведение диалогов Алисы через WSGI-приложение start.application.
+
+Генерирует трассы (Welcome -> геолокация -> викторина -> ответы, советник, бары, непонятые реплики),
+прогоняет их без сети и печатает пропускную способность, p50/p99, аллокации на запрос и пиковый RSS.
+
+    python benchmarks/replay.py --users 200
+    python benchmarks/replay.py --save-baseline benchmarks/baseline.json
+    python benchmarks/replay.py --baseline benchmarks/baseline.json --tolerance 0.2
+
+С --baseline код выхода 1, если хоть один показатель хуже сохранённого больше чем на tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+os.chdir(ROOT)
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('LOG_REQUEST_BODY', 'off')
+# сценарии проигрываются много раз с теми же message_id, иначе мерился бы кэш повторов
+os.environ.setdefault('IDEMPOTENCY_WINDOW', '0')
+os.environ.setdefault('RATE_LIMIT_RATE', '0')
+
+from werkzeug.test import create_environ  # noqa: E402
+
+import start  # noqa: E402
+
+LOCATION = {'lat': 58.5265, 'lon': 31.2795}
+
+# Показатель -> True, если большее значение лучше
+REPORT_KEYS = {
+    'throughput_rps': True,
+    'p50_ms': False,
+    'p99_ms': False,
+    'alloc_bytes_per_request': False,
+    'peak_rss_kb': False,
+}
+
+
+def event(user, message_id, state, command='', type_='SimpleUtterance', intents=None, location=True):
+    session = {'user_id': user, 'session_id': f'session-{user}', 'message_id': message_id, 'new': message_id == 0}
+    if location:
+        session['location'] = LOCATION
+    return {
+        'request': {'command': command, 'original_utterance': command, 'type': type_,
+                    'nlu': {'tokens': command.split(), 'entities': [], 'intents': intents or {}}},
+        'session': session,
+        'state': {'session': state or {}, 'user': {}, 'application': {}},
+        'version': '1.0',
+    }
+
+
+def activity(slot):
+    return {'start_activity': {'slots': {'place': {'type': 'Activity', 'value': slot}}}}
+
+
+def conversation(rnd):
+    """Генератор шагов: получает предыдущий ответ, отдаёт следующий запрос"""
+    response = yield dict(type_='SimpleUtterance')
+    response = yield dict(type_='Geolocation.Allowed')
+    path = rnd.choice(['quiz', 'quiz', 'advice', 'near', 'fallback'])
+    if path == 'quiz':
+        response = yield dict(intents=activity('quiz'))
+        response = yield dict(command=rnd.choice(['история', 'места', 'коктейли', 'сервировка']))
+        for _ in range(rnd.randint(1, 8)):
+            buttons = response['response'].get('buttons', [])
+            if not buttons:
+                break
+            # последняя кнопка - «Выбрать тематику», перед ней правильный ответ и неправильные
+            answers = [button['title'] for button in buttons[:-1]]
+            right = rnd.random() < 0.7
+            if right or len(answers) < 2:
+                # у вопроса без вариантов правильный ответ пустой
+                answer = answers[0] if answers else ''
+            else:
+                answer = answers[rnd.randint(1, len(answers) - 1)]
+            response = yield dict(command=answer)
+        yield dict(command='выбрать тематику')
+    elif path == 'advice':
+        response = yield dict(intents={'start_tour': {'slots': {}}})
+        yield dict(intents=activity('advice'))
+    elif path == 'near':
+        yield dict(intents={'find_near_place': {'slots': {}}})
+    else:
+        yield dict(command='какая завтра погода')
+
+
+class Client:
+    def __init__(self, app):
+        self.app = app
+
+    def post(self, body):
+        environ = create_environ('/post', method='POST', data=body, content_type='application/json')
+        status = []
+
+        def start_response(code, headers, exc_info=None):
+            status.append(code)
+
+        chunks = self.app(environ, start_response)
+        try:
+            data = b''.join(chunks)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        if not status[0].startswith('200'):
+            raise RuntimeError(f'{status[0]}: {data[:200]!r}')
+        return data
+
+
+def generate_traces(users, seed):
+    rnd = random.Random(seed)
+    return [(f'user-{i}', random.Random(rnd.random())) for i in range(users)]
+
+
+def replay(client, traces, on_request=None):
+    latencies = []
+    for user, rnd in traces:
+        steps = conversation(rnd)
+        state = {}
+        response = None
+        message_id = 0
+        while True:
+            try:
+                step = steps.send(response) if response is not None else next(steps)
+            except StopIteration:
+                break
+            body = json.dumps(event(user, message_id, state, **step)).encode('utf-8')
+            if on_request is not None:
+                on_request()
+            start_time = time.perf_counter()
+            data = client.post(body)
+            latencies.append(time.perf_counter() - start_time)
+            response = json.loads(data)
+            state = response.get('session_state', {})
+            message_id += 1
+    return latencies
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def measure_allocations(client, traces):
+    """Средний пик аллокаций на один запрос по tracemalloc"""
+    peaks = []
+    tracemalloc.start()
+    base = [0]
+
+    def before():
+        if base[0]:
+            peaks.append(tracemalloc.get_traced_memory()[1] - base[0])
+        base[0] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    replay(client, traces, on_request=before)
+    peaks.append(tracemalloc.get_traced_memory()[1] - base[0])
+    tracemalloc.stop()
+    return sum(peaks) / len(peaks)
+
+
+def run(users, seed):
+    client = Client(start.application)
+    traces = generate_traces(users, seed)
+    replay(client, generate_traces(min(users, 20), seed + 1))  # прогрев
+
+    started = time.perf_counter()
+    latencies = replay(client, traces)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    return {
+        'requests': len(latencies),
+        'throughput_rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'alloc_bytes_per_request': measure_allocations(client, generate_traces(min(users, 50), seed)),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def regressions(report, baseline, tolerance):
+    failed = []
+    for key, higher_is_better in REPORT_KEYS.items():
+        if key not in baseline:
+            continue
+        if higher_is_better:
+            worse = report[key] < baseline[key] * (1 - tolerance)
+        else:
+            worse = report[key] > baseline[key] * (1 + tolerance)
+        if worse:
+            failed.append(f'{key}: {report[key]:.2f} vs baseline {baseline[key]:.2f}')
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', help='сравнить с сохранённым отчётом')
+    parser.add_argument('--save-baseline', help='сохранить отчёт как новую базу')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = run(args.users, args.seed)
+    for key, value in report.items():
+        print(f'{key:24} {value:12.2f}')
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failed = regressions(report, json.load(f), args.tolerance)
+        for line in failed:
+            print(f'REGRESSION {line}')
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Масштабирование по ядрам: gunicorn с 1..N воркерами под нагрузкой load_test.
+
+    python benchmarks/scaling.py --workers 1 2 4 8 --threads 4 --duration 10
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import ROOT, run, wait_ready  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--port', type=int, default=16700)
+    args = parser.parse_args()
+
+    print(f'cpu: {os.cpu_count()}, threads per worker: {args.threads}, clients: {args.concurrency}')
+    print(f'{"workers":>8} {"rps":>9} {"p50 ms":>8} {"p99 ms":>8} {"speedup":>8}')
+    base = None
+    for workers in args.workers:
+        env = dict(os.environ, WEB_WORKERS=str(workers), WEB_THREADS=str(args.threads),
+                   BIND=f'127.0.0.1:{args.port}', LOG_LEVEL='WARNING', LOG_REQUEST_BODY='off',
+                   IDEMPOTENCY_WINDOW='0', RATE_LIMIT_RATE='0')
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'start:application'],
+                                  cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        url = f'http://127.0.0.1:{args.port}/post'
+        try:
+            wait_ready(url)
+            r = run(url, args.concurrency, args.duration)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+        base = base or r['rps']
+        print(f'{workers:>8} {r["rps"]:>9.1f} {r["p50_ms"]:>8.2f} {r["p99_ms"]:>8.2f} {r["rps"] / base:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Конкурентный доступ к состоянию пользователей из многих потоков с проверкой инвариантов.
+
+1. SessionStore.update: потоки увеличивают общие счётчики и дописывают в общие списки.
+   Сумма счётчиков должна совпасть с числом операций, в списках не должно быть потерь и дублей.
+   Для памяти сравнивается одна блокировка на всё хранилище и блокировки по ключам.
+2. Викторина: каждый поток проходит тему целиком за одного пользователя, все вопросы темы
+   должны встретиться ровно по разу. Несколько потоков с одним и тем же состоянием
+   одного пользователя должны получить одинаковые ответы.
+
+    python benchmarks/stress_sessions.py [--threads 16] [--ops 500]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+os.chdir(ROOT)
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from alice_skill import codec  # noqa: E402
+from alice_skill.content import CONTENT  # noqa: E402
+from alice_skill.cursor import QuizCursor  # noqa: E402
+from alice_skill.dispatch import dispatch  # noqa: E402
+from alice_skill.request import Request  # noqa: E402
+from alice_skill.responses import encode_response  # noqa: E402
+from alice_skill.session import MemorySessionStore, SqliteSessionStore  # noqa: E402
+
+
+def run_threads(count, target):
+    errors = []
+
+    def wrapper(n):
+        try:
+            target(n)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=wrapper, args=(n,)) for n in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - start
+
+
+def stress_store(store, threads, ops, keys, work):
+    def increment(value):
+        if work:
+            time.sleep(work)  # имитация ввода-вывода внутри update, отпускает GIL
+        return value + 1
+
+    def worker(n):
+        for i in range(ops):
+            store.update(f'counter-{(n + i) % keys}', increment, 0)
+            store.update(f'log-{i % keys}', lambda items: items + [(n, i)], [])
+
+    elapsed = run_threads(threads, worker)
+    total = sum(store.get(f'counter-{k}', 0) for k in range(keys))
+    assert total == threads * ops, f'lost counter updates: {total} != {threads * ops}'
+    logged = [item for k in range(keys) for item in store.get(f'log-{k}', [])]
+    assert len(logged) == len(set(logged)) == threads * ops, 'lost or duplicated list updates'
+    return threads * ops * 2 / elapsed
+
+
+def event(user, state, command):
+    return {
+        'request': {'command': command, 'type': 'SimpleUtterance', 'nlu': {'intents': {}}},
+        'session': {'user_id': user, 'session_id': f'session-{user}', 'message_id': 0, 'new': False},
+        'state': {'session': state},
+        'version': '1.0',
+    }
+
+
+def ask(user, state, command):
+    response = dispatch(Request(event(user, dict(state, scene='Quiz'), command)))
+    return bytes(encode_response(response))
+
+
+def play_theme(user, theme):
+    """Проходит тему правильными ответами, возвращает id заданных вопросов"""
+    bank = CONTENT.get().quiz_bank
+    state = codec.loads(ask(user, {}, ''))['session_state']
+    state = codec.loads(ask(user, state, theme))['session_state']
+    seen = []
+    for _ in range(bank.theme_size(theme)):
+        cursor = QuizCursor.from_state(state)
+        question = bank.question_at(theme, cursor.index(bank.theme_size(theme)))
+        seen.append(question.id)
+        reply = codec.loads(ask(user, state, question.answer))
+        assert reply['response']['text'].startswith('Верно!'), reply['response']['text']
+        assert QuizCursor.from_state(reply['session_state']).pos == cursor.pos + 1
+        state = reply['session_state']
+    return seen
+
+
+def stress_quiz(threads, rounds):
+    bank = CONTENT.get().quiz_bank
+    themes = sorted(bank.themes)
+
+    def player(n):
+        for r in range(rounds):
+            theme = themes[(n + r) % len(themes)]
+            seen = play_theme(f'user-{n}', theme)
+            assert sorted(seen) == sorted(bank.themes[theme]), f'{theme}: questions repeated or skipped'
+
+    elapsed = run_threads(threads, player)
+    shared_state = codec.loads(ask('shared', {}, ''))['session_state']
+    shared_state = codec.loads(ask('shared', shared_state, themes[0]))['session_state']
+    cursor = QuizCursor.from_state(shared_state)
+    answer = bank.question_at(cursor.theme, cursor.index(bank.theme_size(cursor.theme))).answer
+    replies = []
+    run_threads(threads, lambda n: replies.extend(ask('shared', shared_state, answer) for _ in range(rounds)))
+    assert len(set(replies)) == 1, 'same state of one user produced different replies'
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=500)
+    parser.add_argument('--keys', type=int, default=8)
+    parser.add_argument('--work', type=float, default=0.0001, help='секунды внутри update для памяти')
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f'{"store":>24} {"updates/s":>10}')
+    for name, stripes in (('memory, one lock', 1), ('memory, striped', 64)):
+        store = MemorySessionStore(max_entries=1000, stripes=stripes)
+        rate = stress_store(store, args.threads, args.ops, args.keys, args.work)
+        print(f'{name:>24} {rate:>10.0f}')
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteSessionStore(os.path.join(tmp, 'sessions.db'), max_entries=1000)
+        rate = stress_store(store, args.threads, args.ops, args.keys, 0)
+        print(f'{"sqlite, versioned":>24} {rate:>10.0f}   conflicts: {store.conflicts}')
+
+    elapsed = stress_quiz(args.threads, args.rounds)
+    print(f'quiz: {args.threads} threads x {args.rounds} themes in {elapsed:.2f}s, invariants hold')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""Продакшен-запуск: gunicorn -c gunicorn.conf.py start:application
+
+Приложение и контент загружаются один раз в мастере, воркеры получают их через fork
+и делят страницы памяти, пока не начнут их менять.
+"""
+import gc
+import multiprocessing
+import os
+
+pythonpath = 'src'
+bind = os.environ.get('BIND', '0.0.0.0:1337')
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = True
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 20))
+keepalive = 5
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get('WEB_ACCESS_LOG')
+
+
+def when_ready(server):
+    from alice_skill.content import CONTENT
+
+    CONTENT.get()
+    # Всё, что создано до fork, уводим из-под сборщика мусора: иначе он трогает
+    # заголовки объектов и копирование при записи разделяет страницы между воркерами
+    gc.freeze()
+    server.log.info('Content preloaded, %s objects frozen', gc.get_freeze_count())
@@ -0,0 +1,62 @@
+"""JSON для тела вебхука: orjson или ujson, если установлены, иначе стандартный json.
+
+Бэкенд можно выбрать явно через JSON_BACKEND=orjson|ujson|json.
+Ошибка разбора у всех бэкендов приходит как DecodeError.
+"""
+import json
+import os
+
+
+class DecodeError(ValueError):
+    pass
+
+
+def _stdlib():
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    return 'json', json.loads, dumps
+
+
+def _orjson():
+    import orjson
+
+    return 'orjson', orjson.loads, orjson.dumps
+
+
+def _ujson():
+    import ujson
+
+    def dumps(obj):
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+    return 'ujson', ujson.loads, dumps
+
+
+BACKENDS = {'orjson': _orjson, 'ujson': _ujson, 'json': _stdlib}
+
+
+def _select(name=None):
+    if name:
+        return BACKENDS[name]()
+    for factory in (_orjson, _ujson):
+        try:
+            return factory()
+        except ImportError:
+            pass
+    return _stdlib()
+
+
+def _checked(backend_loads):
+    # orjson, ujson и json бросают свои подклассы ValueError, а json для bytes ещё и UnicodeDecodeError
+    def loads(data):
+        try:
+            return backend_loads(data)
+        except ValueError as e:
+            raise DecodeError(str(e)) from e
+
+    return loads
+
+
+BACKEND, _loads, dumps = _select(os.environ.get('JSON_BACKEND'))
+loads = _checked(_loads)
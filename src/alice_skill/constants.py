@@ -1,9 +1,35 @@
 import os
-from modules.alice_library.alice import YandexAlice
+import threading
+
+# Library: ALICE и SESSION_STORAGE создаются при первом обращении, а не при импорте
+
+
+def _create_alice():
+    from modules.alice_library.alice import YandexAlice
+    return YandexAlice(os.environ.get('OAUTH_TOKEN'), os.environ.get("SKILL_ID"))
+
+
+def _create_session_store():
+    from alice_skill.session import create_session_store
+    return create_session_store()
+
+
+_LAZY = {
+    'ALICE': _create_alice,
+    'SESSION_STORAGE': _create_session_store,
+}
+_lazy_lock = threading.Lock()
+
+
+def __getattr__(name):
+    factory = _LAZY.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _lazy_lock:
+        if name not in globals():
+            globals()[name] = factory()
+    return globals()[name]
 
-# Library
-ALICE = YandexAlice(os.environ.get('OAUTH_TOKEN'), os.environ.get("SKILL_ID"))
-SESSION_STORAGE = {}
 
 # State
 STATE_REQUEST_KEY = 'session'
@@ -20,9 +46,9 @@ START_ACTIVITY = 'start_activity'
 START_ACTIVITY_SHORT = 'start_activity_short'
 FIND_NEAR_PLACE = 'find_near_place'
 STOP_ACTIVITY = 'stop_activity'
+# Только локальный разбор (nlu.py): в реплике названо заведение
+SHOW_PLACE = 'show_place'
+
+# Slots
+ACTIVITY_SLOT = 'place'
 
-# Coordinates
-ENCHANTRESS_location = {'lat': 58.521698, 'lon': 31.268701}
-ZAVOD_BAR_location = {'lat': 58.52703,'lon': 31.259656}
-JAZZ_BLUES_location = {'lat': 58.518129,'lon': 31.286911}
-GOAT_location = {'lat': 58.526687,'lon': 31.279455}
\ No newline at end of file
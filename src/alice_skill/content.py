@@ -0,0 +1,145 @@
+"""Контент навыка: вопросы викторины и заведения.
+
+Файлы читаются при первом обращении. Раз в CONTENT_CHECK_INTERVAL секунд проверяется их
+mtime и размер, при изменении новый снимок собирается в отдельном потоке и подменяется
+целиком, а запросы до этого момента продолжают работать со старым.
+
+Кэш ближайших заведений по ячейкам геохэша живёт в снимке, поэтому сбрасывается при смене venues.csv.
+GEO_CACHE_WARM="lat_lo,lon_lo,lat_hi,lon_hi" заполняет его для прямоугольника города сразу при загрузке.
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+from alice_skill.nlu import build_matcher
+from alice_skill.quiz_bank import load_quiz_bank
+from alice_skill.venues import NearestCache, load_venues
+
+logger = logging.getLogger('app')
+
+
+class Snapshot(namedtuple('Snapshot', ['version', 'quiz_bank', 'venues', 'venues_by_id', 'venues_by_scene',
+                                         'nearest_cache', 'matcher', 'templates'])):
+    """Неизменяемый снимок контента. templates - кэш готовых ответов, живёт вместе со снимком"""
+
+    __slots__ = ()
+
+
+class ContentLoader:
+    def __init__(self, quiz_path='quiz.csv', venues_path='venues.csv', quiz_encoding='windows-1251',
+                 quiz_quotechar=' ', check_interval=5.0, geo_precision=7, geo_cache_size=20000, geo_warm=None):
+        self.quiz_path = quiz_path
+        self.venues_path = venues_path
+        self.quiz_encoding = quiz_encoding
+        self.quiz_quotechar = quiz_quotechar
+        self.check_interval = check_interval
+        self.geo_precision = geo_precision
+        self.geo_cache_size = geo_cache_size
+        self.geo_warm = geo_warm
+        self._snapshot = None
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+
+    def _stat(self):
+        signature = []
+        for path in (self.quiz_path, self.venues_path):
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        return tuple(signature)
+
+    def _load(self, version):
+        signature = self._stat()
+        venues = load_venues(self.venues_path)
+        venues_by_id = {venue.id: venue for venue in venues}
+        venues_by_scene = {}
+        for venue in venues:
+            venues_by_scene.setdefault(venue.scene, venue)
+        nearest_cache = NearestCache(venues, self.geo_precision, self.geo_cache_size)
+        if self.geo_warm:
+            nearest_cache.warm(*self.geo_warm)
+        quiz_bank = load_quiz_bank(self.quiz_path, self.quiz_encoding, self.quiz_quotechar)
+        snapshot = Snapshot(
+            version=version,
+            quiz_bank=quiz_bank,
+            venues=venues,
+            venues_by_id=venues_by_id,
+            venues_by_scene=venues_by_scene,
+            nearest_cache=nearest_cache,
+            matcher=build_matcher(quiz_bank, venues),
+            templates={},
+        )
+        return snapshot, signature
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot, self._signature = self._load(1)
+                    self._next_check = time.monotonic() + self.check_interval
+                return self._snapshot
+        if self.check_interval > 0 and time.monotonic() >= self._next_check:
+            self._check()
+        return snapshot
+
+    def _check(self):
+        with self._lock:
+            if self._reloading or time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                changed = self._stat() != self._signature
+            except OSError:
+                return
+            if changed:
+                self._reloading = True
+                threading.Thread(target=self._reload, name='content-reload', daemon=True).start()
+
+    def _reload(self):
+        try:
+            snapshot, signature = self._load(self._snapshot.version + 1)
+        except Exception:
+            # Битый файл не должен ронять навык: остаёмся на старом снимке до следующего изменения
+            logger.exception('Failed to reload content')
+            try:
+                signature = self._stat()
+            except OSError:
+                signature = self._signature
+            with self._lock:
+                self._signature = signature
+                self._reloading = False
+            return
+        with self._lock:
+            self._snapshot = snapshot
+            self._signature = signature
+            self._reloading = False
+        logger.info('Content reloaded, version %s: %s questions, %s venues',
+                    snapshot.version, len(snapshot.quiz_bank), len(snapshot.venues))
+
+    def reload(self):
+        """Синхронная перезагрузка, например по сигналу"""
+        with self._lock:
+            version = self._snapshot.version + 1 if self._snapshot is not None else 1
+            self._snapshot, self._signature = self._load(version)
+
+
+def _bbox(value):
+    if not value:
+        return None
+    return tuple(float(x) for x in value.split(','))
+
+
+CONTENT = ContentLoader(
+    quiz_path=os.environ.get('QUIZ_PATH', 'quiz.csv'),
+    venues_path=os.environ.get('VENUES_PATH', 'venues.csv'),
+    quiz_encoding=os.environ.get('QUIZ_ENCODING', 'windows-1251'),
+    quiz_quotechar=os.environ.get('QUIZ_QUOTECHAR', ' '),
+    check_interval=float(os.environ.get('CONTENT_CHECK_INTERVAL', 5)),
+    geo_precision=int(os.environ.get('GEO_CELL_PRECISION', 7)),
+    geo_cache_size=int(os.environ.get('GEO_CACHE_SIZE', 20000)),
+    geo_warm=_bbox(os.environ.get('GEO_CACHE_WARM')),
+)
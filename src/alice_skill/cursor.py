@@ -0,0 +1,45 @@
+import math
+import random
+from collections import namedtuple
+
+
+class QuizCursor(namedtuple('QuizCursor', ['theme', 'seed', 'pos'])):
+    """Положение игрока в викторине.
+
+    Порядок вопросов темы задаётся аффинной перестановкой (stride * pos + offset) mod n,
+    которая целиком выводится из seed, поэтому курсор помещается в session_state
+    и сервер не хранит ничего между запросами.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def start(cls, theme):
+        return cls(theme, random.getrandbits(31), 0)
+
+    @classmethod
+    def from_state(cls, state):
+        """Курсор из session_state или None, если его нет или он испорчен"""
+        value = state.get('quiz')
+        if not isinstance(value, (list, tuple)) or len(value) != 3:
+            return None
+        theme, seed, pos = value
+        if not isinstance(theme, str) or type(seed) is not int or type(pos) is not int or seed < 0 or pos < 0:
+            return None
+        return cls(theme, seed, pos)
+
+    def to_state(self):
+        return [self.theme, self.seed, self.pos]
+
+    def next(self):
+        return self._replace(pos=self.pos + 1)
+
+    def index(self, n):
+        """Номер текущего вопроса среди n вопросов темы"""
+        if n <= 1:
+            return 0
+        stride = self.seed % n or 1
+        while math.gcd(stride, n) != 1:
+            stride += 1
+        offset = (self.seed // n) % n
+        return (stride * self.pos + offset) % n
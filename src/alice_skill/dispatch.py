@@ -0,0 +1,128 @@
+import os
+import types
+from collections.abc import Awaitable
+from time import perf_counter
+
+from modules.log.log import logger
+
+import alice_skill.constants as alice
+from alice_skill.guard import IdempotencyCache, RateLimiter
+from alice_skill.metrics import METRICS
+from alice_skill.profiler import PROFILER
+from alice_skill.request import Request
+from alice_skill.responses import encode_response
+from alice_skill.scenes import ROUTER
+
+IDEMPOTENCY = IdempotencyCache(window=float(os.environ.get('IDEMPOTENCY_WINDOW', 30)))
+LIMITER = RateLimiter(rate=float(os.environ.get('RATE_LIMIT_RATE', 5)),
+                      burst=int(os.environ.get('RATE_LIMIT_BURST', 10)))
+
+METRICS.gauge('alice_guard', lambda: {
+    (('stat', 'idempotency_entries'),): len(IDEMPOTENCY),
+    (('stat', 'idempotency_hits'),): IDEMPOTENCY.hits,
+    (('stat', 'idempotency_coalesced'),): IDEMPOTENCY.coalesced,
+    (('stat', 'rate_limited_users'),): len(LIMITER),
+    (('stat', 'rate_limited'),): LIMITER.limited,
+})
+
+
+def _dispatch(req: Request):
+    current_scene_id = req.state.get('scene')
+
+    if current_scene_id is None:
+        scene = ROUTER.default
+        return METRICS.timed(scene.id(), 'reply', scene.reply, req)
+    current_scene = ROUTER.scene(current_scene_id)
+    if ROUTER.is_sticky(current_scene_id):
+        return METRICS.timed(current_scene.id(), 'reply', current_scene.reply, req)
+
+    next_scene = METRICS.timed(current_scene.id(), 'move', current_scene.move, req)
+    if next_scene is not None:
+        logger.info('Moving from scene %s to %s', current_scene.id(), next_scene.id())
+        return METRICS.timed(next_scene.id(), 'reply', next_scene.reply, req)
+    else:
+        logger.info('Failed to parse user request at scene %s', current_scene.id())
+        return METRICS.timed(current_scene.id(), 'fallback', current_scene.fallback)
+
+
+def dispatch(req: Request):
+    """Ответ на запрос. Если обработчик сцены асинхронный, вернётся awaitable"""
+    if not METRICS.enabled:
+        return _dispatch(req)
+    start = perf_counter()
+    try:
+        return _dispatch(req)
+    finally:
+        METRICS.observe('alice_dispatch_latency_seconds', (), perf_counter() - start)
+
+
+async def dispatch_async(req: Request):
+    response = dispatch(req)
+    if isinstance(response, Awaitable):
+        response = await response
+    return response
+
+
+def _idempotency_key(req: Request):
+    session = req.session or {}
+    session_id = session.get('session_id')
+    message_id = session.get('message_id')
+    if session_id is None or message_id is None:
+        return None
+    return session_id, message_id
+
+
+def _too_many_requests(req: Request):
+    # Состояние оставляем прежним, чтобы следующая реплика продолжила с того же места
+    return {
+        'response': {'text': 'Слишком много запросов, давай чуть помедленнее.'},
+        'version': '1.0',
+        alice.STATE_RESPONSE_KEY: req.state,
+    }
+
+
+def _compute(req: Request):
+    session = req.session or {}
+    if not LIMITER.allow(session.get('user_id')):
+        return encode_response(_too_many_requests(req))
+    response = dispatch(req)
+    if isinstance(response, types.CoroutineType):
+        # Асинхронные сцены в синхронном сервере выполняются до конца прямо в потоке запроса.
+        # asyncio импортируется только здесь: это заметная часть времени холодного старта
+        import asyncio
+        response = asyncio.run(response)
+    return encode_response(response)
+
+
+def _handle(req: Request):
+    key = _idempotency_key(req)
+    if key is None:
+        return _compute(req)
+    return IDEMPOTENCY.run(key, lambda: _compute(req))
+
+
+def handle(req: Request):
+    """dispatch для вебхука: повторы реплики получают один и тот же ответ, частые запросы ограничиваются"""
+    if PROFILER.active:
+        return PROFILER.run(_handle, req)
+    return _handle(req)
+
+
+async def _compute_async(req: Request):
+    session = req.session or {}
+    if not LIMITER.allow(session.get('user_id')):
+        return encode_response(_too_many_requests(req))
+    return encode_response(await dispatch_async(req))
+
+
+async def _handle_async(req: Request):
+    key = _idempotency_key(req)
+    if key is None:
+        return await _compute_async(req)
+    return await IDEMPOTENCY.run_async(key, lambda: _compute_async(req))
+
+
+async def handle_async(req: Request):
+    if PROFILER.active:
+        return await PROFILER.run_async(_handle_async, req)
+    return await _handle_async(req)
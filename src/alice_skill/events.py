@@ -0,0 +1,137 @@
+"""Журнал ответов викторины для офлайн-аналитики.
+
+Файл состоит из записей фиксированного размера RECORD без заголовка, только дописывается.
+Поток запроса кладёт кортеж в очередь, а упаковка, хэш пользователя и запись идут в отдельном
+потоке пачками, одним write на пачку. Файл открыт с O_APPEND, поэтому воркеры gunicorn
+могут писать в один журнал: пачка целиком ложится после уже записанных.
+Очередь ограничена max_queued событиями: если писатель не успевает, лишние события отбрасываются,
+а если файл не открылся или запись упала, журнал выключается.
+Включается переменной QUIZ_EVENT_LOG=путь, разбирается src/quiz_stats.py.
+"""
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+
+logger = logging.getLogger('app')
+
+# время, хэш пользователя, id вопроса, seed курсора, позиция в теме, версия контента, событие
+RECORD = struct.Struct('<dQIIHHB3x')
+FIELDS = ('time', 'user', 'question', 'seed', 'pos', 'version', 'kind')
+
+ASKED = 1
+CORRECT = 2
+WRONG = 3
+
+
+def user_hash(user_id):
+    return int.from_bytes(hashlib.blake2b(user_id.encode(), digest_size=8).digest(), 'little')
+
+
+class EventLog:
+    enabled = True
+
+    def __init__(self, path, flush_interval=0.05, batch_size=4096, max_queued=100000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self.written = 0
+        self.dropped = 0
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_writer(self):
+        # Поток-писатель не переживает fork, поэтому он свой у каждого процесса и создаётся при первой записи
+        with self._lock:
+            if self._pid == os.getpid():
+                return True
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            except OSError:
+                logger.exception('Cannot open quiz event log %s, events are not collected', self.path)
+                self.enabled = False
+                return False
+            self._queue = queue.Queue(self.max_queued)
+            self._thread = threading.Thread(target=self._run, args=(self._queue, fd), name='quiz-events', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+            return True
+
+    def quiz(self, kind, user_id, question_id, seed, pos, version):
+        if self._pid != os.getpid() and not self._ensure_writer():
+            return
+        try:
+            self._queue.put_nowait((time.time(), user_id, question_id, seed, pos, version, kind))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self, events, fd):
+        hashes = {}
+        try:
+            while True:
+                batch = [events.get()]
+                time.sleep(self.flush_interval)
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(events.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = None in batch
+                if stop:
+                    batch = [event for event in batch if event is not None]
+                buffer = bytearray(RECORD.size * len(batch))
+                for i, (ts, user_id, question_id, seed, pos, version, kind) in enumerate(batch):
+                    user = hashes.get(user_id)
+                    if user is None:
+                        if len(hashes) > 100000:
+                            hashes.clear()
+                        user = hashes[user_id] = user_hash(user_id)
+                    RECORD.pack_into(buffer, i * RECORD.size, ts, user, question_id, seed & 0xFFFFFFFF,
+                                     min(pos, 0xFFFF), version & 0xFFFF, kind)
+                view = memoryview(buffer)
+                while view:
+                    view = view[os.write(fd, view):]
+                self.written += len(batch)
+                if stop:
+                    return
+        except Exception:
+            logger.exception('Quiz event log writer failed, events are not collected from now on')
+            self.enabled = False
+        finally:
+            os.close(fd)
+
+    def close(self):
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=5)
+        except queue.Full:
+            return
+        self._thread.join(timeout=5)
+        self._pid = None
+
+
+class NullEventLog:
+    """Журнал выключен: события не собираются"""
+
+    enabled = False
+
+    def quiz(self, kind, user_id, question_id, seed, pos, version):
+        pass
+
+    def close(self):
+        pass
+
+
+if os.environ.get('QUIZ_EVENT_LOG'):
+    EVENTS = EventLog(os.environ['QUIZ_EVENT_LOG'])
+    atexit.register(EVENTS.close)
+else:
+    EVENTS = NullEventLog()
@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ('expires', 'value', 'done', 'event', 'future')
+
+    def __init__(self, expires):
+        self.expires = expires
+        self.value = None
+        self.done = False
+        self.event = None
+        self.future = None
+
+
+class IdempotencyCache:
+    """Ответы на уже обработанные реплики.
+
+    Алиса повторяет запрос, если вебхук отвечает долго, а пользователь может нажать кнопку дважды.
+    Повтор того же (session_id, message_id) в пределах окна получает сохранённый ответ,
+    а одновременные повторы ждут результата первого запроса вместо того, чтобы считать его ещё раз.
+    """
+
+    def __init__(self, window=30.0, max_entries=50000, wait_timeout=5.0):
+        self.window = window
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.hits = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        entries = self._entries
+        while entries:
+            key, entry = next(iter(entries.items()))
+            # запрос, который ещё считается, не выбрасываем, чтобы дубли его дождались
+            if not entry.done or (entry.expires > now and len(entries) <= self.max_entries):
+                break
+            del entries[key]
+
+    def _claim(self, key):
+        """(entry, owner): owner=True, если считать ответ должен вызывающий"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires > now:
+                return entry, False
+            entry = self._entries[key] = _Entry(now + self.window)
+            return entry, True
+
+    def _forget(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def run(self, key, compute):
+        entry, owner = self._claim(key)
+        if not owner:
+            if entry.done:
+                self.hits += 1
+                return entry.value
+            with self._lock:
+                # done выставляется до _finish, поэтому событие либо увидит _finish, либо не понадобится
+                if not entry.done and entry.event is None:
+                    entry.event = threading.Event()
+                event = entry.event
+            if not entry.done:
+                event.wait(self.wait_timeout)
+            if entry.done:
+                self.coalesced += 1
+                return entry.value
+            # первый запрос упал или завис: считаем сами
+            return compute()
+        try:
+            value = compute()
+        except BaseException:
+            self._forget(key, entry)
+            self._finish(entry)
+            raise
+        entry.value = value
+        entry.done = True
+        self._finish(entry)
+        return value
+
+    def _finish(self, entry):
+        with self._lock:
+            event = entry.event
+            future = entry.future
+        if event is not None:
+            event.set()
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    async def run_async(self, key, compute):
+        import asyncio
+
+        entry, owner = self._claim(key)
+        if not owner:
+            if entry.done:
+                self.hits += 1
+                return entry.value
+            if entry.future is None:
+                entry.future = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(asyncio.shield(entry.future), self.wait_timeout)
+            except asyncio.TimeoutError:
+                pass
+            if entry.done:
+                self.coalesced += 1
+                return entry.value
+            return await compute()
+        try:
+            value = await compute()
+        except BaseException:
+            self._forget(key, entry)
+            self._finish(entry)
+            raise
+        entry.value = value
+        entry.done = True
+        self._finish(entry)
+        return value
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RateLimiter:
+    """Token bucket на пользователя: rate запросов в секунду, не больше burst подряд.
+
+    Корзина, которая успела бы наполниться целиком, ничем не отличается от новой,
+    поэтому такие пользователи забываются и память занимают только активные.
+    """
+
+    def __init__(self, rate=5.0, burst=10, max_users=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self.idle = burst / rate if rate > 0 else 0
+        self.limited = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, user_id):
+        if self.rate <= 0 or user_id is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._buckets
+            while buckets:
+                oldest = next(iter(buckets.values()))
+                if now - oldest[1] < self.idle and len(buckets) < self.max_users:
+                    break
+                buckets.popitem(last=False)
+            bucket = buckets.get(user_id)
+            if bucket is None:
+                bucket = buckets[user_id] = [float(self.burst), now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                buckets.move_to_end(user_id)
+            if bucket[0] < 1:
+                self.limited += 1
+                return False
+            bucket[0] -= 1
+            return True
+
+    def __len__(self):
+        return len(self._buckets)
@@ -0,0 +1,160 @@
+"""Счётчики и гистограммы задержек по сценам в текстовом формате Prometheus.
+
+Каждый поток пишет только в свой шард, поэтому запись обходится без блокировок,
+а при чтении /metrics шарды суммируются. Шарды завершившихся потоков сливаются в один
+при регистрации шарда нового потока и при чтении, поэтому сервер с потоком на запрос
+не копит их и между чтениями /metrics.
+Включается переменной METRICS_ENABLED=1.
+
+Доля непонятых реплик: alice_scene_calls_total{method="fallback"} / alice_scene_calls_total{method="move"}.
+"""
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class _Shard:
+    __slots__ = ('counters', 'histograms')
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.gauges = {}
+        self._shards = []
+        self._retired = _Shard()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._retire()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire(self):
+        # вызывается под self._lock
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = alive
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            # счётчики по корзинам, последняя для +Inf, затем сумма
+            histogram = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    def gauge(self, name, callback):
+        """callback() -> {labels: значение}, вызывается при каждом чтении метрик"""
+        self.gauges[name] = callback
+
+    def timed(self, scene_id, method, fn, *args):
+        start = perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            labels = (('scene', scene_id), ('method', method))
+            self.inc('alice_scene_calls_total', labels)
+            self.observe('alice_scene_latency_seconds', labels, perf_counter() - start)
+
+    @staticmethod
+    def _merge(target, shard):
+        for key, value in list(shard.counters.items()):
+            target.counters[key] = target.counters.get(key, 0) + value
+        for key, values in list(shard.histograms.items()):
+            total = target.histograms.get(key)
+            if total is None:
+                target.histograms[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    total[i] += value
+
+    def _collect(self):
+        with self._lock:
+            self._retire()
+            alive = self._shards
+            result = _Shard()
+            self._merge(result, self._retired)
+        for _, shard in alive:
+            self._merge(result, shard)
+        return result.counters, result.histograms
+
+    def render(self):
+        counters, histograms = self._collect()
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f'# TYPE {name} counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f'# TYPE {name} histogram')
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), values):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {values[-1]}')
+                lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        for name, callback in sorted(self.gauges.items()):
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in sorted(callback().items()):
+                lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class NullMetrics:
+    """Заглушка на случай выключенных метрик: ничего не считает"""
+
+    enabled = False
+
+    def inc(self, name, labels=(), value=1):
+        pass
+
+    def observe(self, name, labels, seconds):
+        pass
+
+    def gauge(self, name, callback):
+        pass
+
+    def timed(self, scene_id, method, fn, *args):
+        return fn(*args)
+
+    def render(self):
+        return ''
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+METRICS = Metrics() if os.environ.get('METRICS_ENABLED', '0') == '1' else NullMetrics()
@@ -0,0 +1,148 @@
+"""Локальный разбор реплик без запроса к NLU Алисы.
+
+Все известные фразы (темы викторины, ответы, названия баров, синонимы активностей)
+собираются в автомат Ахо-Корасик при загрузке контента, после чего поиск всех
+вхождений в реплике занимает время, линейное по её длине, сколько бы фраз ни было.
+Фраза засчитывается только целыми словами: «70» не находится в «700».
+"""
+import re
+from collections import Counter, deque
+
+_SEPARATORS = re.compile(r'[\W_]+')
+
+ACTIVITY_PHRASES = {
+    'quiz': ('викторина', 'викторину', 'викторины', 'поиграть'),
+    'quest': ('квест', 'квеста', 'экскурсия', 'экскурсию'),
+    'advice': ('совет', 'советник', 'посоветуй', 'посоветуйте', 'куда сходить'),
+}
+# Кнопка Welcome «Начни экскурсию» начинает тур, а не квест, хотя в ней есть «экскурсию»
+TOUR_PHRASES = ('начни экскурсию', 'начать экскурсию')
+CHOOSE_THEME_PHRASES = ('выбрать тематику', 'выбрать тему', 'сменить тему', 'другая тема')
+
+
+def normalize(text):
+    """Нижний регистр, ё -> е, слова через один пробел без знаков препинания"""
+    return _SEPARATORS.sub(' ', text.lower().replace('ё', 'е')).strip()
+
+
+class Automaton:
+    """Автомат Ахо-Корасик по символам"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._phrases = [()]  # фразы, которые кончаются в узле
+        self._out = None  # они же вместе с фразами по суффиксным ссылкам, после build
+
+    def add(self, phrase):
+        node = 0
+        for char in phrase:
+            following = self._goto[node].get(char)
+            if following is None:
+                following = self._goto[node][char] = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._phrases.append(())
+            node = following
+        if phrase not in self._phrases[node]:
+            self._phrases[node] += (phrase,)
+        self._out = None
+
+    def build(self):
+        goto, fail = self._goto, self._fail
+        out = list(self._phrases)
+        queue = deque(goto[0].values())
+        for node in queue:
+            fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                out[child] += out[fail[child]]
+                queue.append(child)
+        self._out = out
+
+    def iter(self, text):
+        """(start, end, phrase) для всех вхождений, в порядке окончания"""
+        if self._out is None:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for phrase in out[state]:
+                yield i + 1 - len(phrase), i + 1, phrase
+
+
+class Matcher:
+    """Фразы с их значениями: kind -> value, например ('theme', 'история') или ('venue', 'Goat')"""
+
+    def __init__(self):
+        self._automaton = Automaton()
+        self._meanings = {}
+
+    def add(self, kind, value, *phrases):
+        for phrase in phrases:
+            phrase = normalize(phrase)
+            if not phrase:
+                continue
+            self._automaton.add(phrase)
+            meanings = self._meanings.setdefault(phrase, [])
+            if (kind, value) not in meanings:
+                meanings.append((kind, value))
+
+    def compile(self):
+        self._automaton.build()
+        return self
+
+    def phrases(self, text):
+        """Известные фразы, которые входят в реплику целыми словами"""
+        text = normalize(text)
+        found = set()
+        for start, end, phrase in self._automaton.iter(text):
+            if (start == 0 or text[start - 1] == ' ') and (end == len(text) or text[end] == ' '):
+                found.add((start, end, phrase))
+        return found
+
+    def find(self, text):
+        """{kind: value} по самому левому, а при равенстве самому длинному вхождению каждого вида"""
+        best = {}
+        for start, end, phrase in self.phrases(text):
+            for kind, value in self._meanings[phrase]:
+                rank = (start, start - end)
+                if kind not in best or rank < best[kind][0]:
+                    best[kind] = (rank, value)
+        return {kind: value for kind, (_, value) in best.items()}
+
+    def is_answer(self, text, question):
+        """Реплика называет правильный ответ и не называет неправильных"""
+        answer = normalize(question.answer)
+        if not answer:
+            return not normalize(text)
+        found = {phrase for _, _, phrase in self.phrases(text)}
+        wrong = {normalize(x) for x in question.wrong_answers} - {answer}
+        return answer in found and not wrong & found
+
+
+def build_matcher(quiz_bank, venues):
+    matcher = Matcher()
+    for theme in quiz_bank.themes:
+        matcher.add('theme', theme, theme)
+    for question in quiz_bank.questions:
+        # значение не нужно: ответы сверяются с конкретным вопросом в is_answer
+        matcher.add('answer', None, question.answer, *question.wrong_answers)
+    scenes = Counter(venue.scene for venue in venues)
+    for venue in venues:
+        # имя сцены называет заведение, только если сцена у него своя, а не общая Bar
+        phrases = (venue.name, venue.id, venue.scene) if scenes[venue.scene] == 1 else (venue.name, venue.id)
+        matcher.add('venue', venue.id, *phrases)
+    for slot, phrases in ACTIVITY_PHRASES.items():
+        matcher.add('activity', slot, *phrases)
+    matcher.add('tour', 'start_tour', *TOUR_PHRASES)
+    matcher.add('control', 'choose_theme', *CHOOSE_THEME_PHRASES)
+    return matcher.compile()
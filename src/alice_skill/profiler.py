@@ -0,0 +1,260 @@
+"""Профилирование живого трафика по запросу.
+
+Два режима:
+    sample   - поток-сэмплер раз в PROFILE_INTERVAL секунд снимает стеки потоков, которые
+               сейчас обрабатывают запрос, результат в формате collapsed stacks
+               (flamegraph.pl, speedscope);
+    cprofile - cProfile на запрос, результат в pstats. Профилируется один запрос
+               за раз, остальные в это время идут без профилировщика.
+
+Сессия заканчивается после requests запросов или seconds секунд, что наступит раньше,
+и файл пишется в PROFILE_DIR. У каждого процесса своя сессия и свой файл.
+Пока профилирование выключено, обработка запроса платит только за проверку PROFILER.active.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger('app')
+
+MODES = ('sample', 'cprofile')
+
+
+class _SamplingSession:
+    suffix = 'collapsed'
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = Counter()
+        self._threads = Counter()  # ident -> число запросов потока в работе, в asyncio их несколько
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='profiler-sampler', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self._threads):
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                self.samples[tuple(stack)] += 1
+
+    def _enter(self):
+        self._threads[threading.get_ident()] += 1
+
+    def _exit(self):
+        ident = threading.get_ident()
+        self._threads[ident] -= 1
+        if self._threads[ident] <= 0:
+            del self._threads[ident]
+
+    def run(self, fn, *args):
+        self._enter()
+        try:
+            return fn(*args)
+        finally:
+            self._exit()
+
+    async def run_async(self, fn, *args):
+        self._enter()
+        try:
+            return await fn(*args)
+        finally:
+            self._exit()
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def dump(self, path):
+        names = {}
+
+        def name(code):
+            value = names.get(code)
+            if value is None:
+                value = names[code] = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+            return value
+
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(';'.join(name(code) for code in reversed(stack)) + f' {count}\n')
+        return sum(self.samples.values())
+
+
+class _CProfileSession:
+    suffix = 'pstats'
+
+    def __init__(self, interval):
+        # pstats тянет за собой inspect и dataclasses, при старте процесса они не нужны
+        import cProfile
+        import pstats
+
+        self._profile_cls = cProfile.Profile
+        self._stats_cls = pstats.Stats
+        self.stats = None
+        self._busy = threading.Lock()
+
+    def _merge(self, profile):
+        if self.stats is None:
+            self.stats = self._stats_cls(profile)
+        else:
+            self.stats.add(profile)
+
+    def run(self, fn, *args):
+        # Два активных cProfile в разных потоках не поддерживаются, поэтому профилируем по одному
+        if not self._busy.acquire(blocking=False):
+            return fn(*args)
+        try:
+            profile = self._profile_cls()
+            try:
+                return profile.runcall(fn, *args)
+            finally:
+                self._merge(profile)
+        finally:
+            self._busy.release()
+
+    async def run_async(self, fn, *args):
+        # В цикле событий в профиль попадут и корутины других запросов, которые успели выполниться
+        if not self._busy.acquire(blocking=False):
+            return await fn(*args)
+        try:
+            profile = self._profile_cls()
+            profile.enable()
+            try:
+                return await fn(*args)
+            finally:
+                profile.disable()
+                self._merge(profile)
+        finally:
+            self._busy.release()
+
+    def close(self):
+        pass
+
+    def dump(self, path):
+        if self.stats is None:
+            return 0
+        self.stats.dump_stats(path)
+        return self.stats.total_calls
+
+
+class Profiler:
+    def __init__(self, output_dir='.', interval=0.005):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.active = False
+        self._session = None
+        self._pending = None
+        self._remaining = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def schedule(self, mode='sample', requests=0, seconds=0.0):
+        """Сессия начнётся с первым запросом в процессе: с preload_app это уже воркер, а не мастер"""
+        if mode not in MODES:
+            raise ValueError(f'Unknown profiling mode: {mode}')
+        self._pending = (mode, requests, seconds)
+        self.active = True
+
+    def start(self, mode='sample', requests=0, seconds=0.0):
+        if mode not in MODES:
+            raise ValueError(f'Unknown profiling mode: {mode}')
+        with self._lock:
+            if self._session is not None:
+                raise RuntimeError('Profiling is already running')
+            self._start(mode, requests, seconds)
+
+    def _start(self, mode, requests, seconds):
+        session_cls = _SamplingSession if mode == 'sample' else _CProfileSession
+        self._session = session_cls(self.interval)
+        self._remaining = requests or None
+        self._pending = None
+        if seconds:
+            self._timer = threading.Timer(seconds, self.stop)
+            self._timer.daemon = True
+            self._timer.start()
+        self.active = True
+        logger.info('Profiling started: %s, %s requests, %s seconds', mode, requests or '-', seconds or '-')
+        return self._session
+
+    def _current(self):
+        session = self._session
+        if session is None and self._pending is not None:
+            with self._lock:
+                if self._session is None and self._pending is not None:
+                    self._start(*self._pending)
+                session = self._session
+        return session
+
+    def _count(self):
+        with self._lock:
+            if self._remaining is None:
+                return
+            self._remaining -= 1
+            done = self._remaining <= 0
+        if done:
+            self.stop()
+
+    def run(self, fn, *args):
+        session = self._current()
+        if session is None:
+            return fn(*args)
+        try:
+            return session.run(fn, *args)
+        finally:
+            self._count()
+
+    async def run_async(self, fn, *args):
+        session = self._current()
+        if session is None:
+            return await fn(*args)
+        try:
+            return await session.run_async(fn, *args)
+        finally:
+            self._count()
+
+    def stop(self):
+        """Заканчивает сессию и возвращает путь к файлу с результатом или None, если сессии не было"""
+        with self._lock:
+            session = self._session
+            if session is None:
+                return None
+            self._session = None
+            self._remaining = None
+            self.active = self._pending is not None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        session.close()
+        path = os.path.join(self.output_dir, f'profile-{os.getpid()}-{int(time.time() * 1000)}.{session.suffix}')
+        total = session.dump(path)
+        logger.info('Profiling finished: %s, %s', path, total)
+        return path
+
+    def status(self):
+        return {
+            'active': self._session is not None,
+            'scheduled': self._pending is not None,
+            'remaining_requests': self._remaining,
+        }
+
+
+PROFILER = Profiler(
+    output_dir=os.environ.get('PROFILE_DIR', '.'),
+    interval=float(os.environ.get('PROFILE_INTERVAL', 0.005)),
+)
+if os.environ.get('PROFILE_REQUESTS') or os.environ.get('PROFILE_SECONDS'):
+    PROFILER.schedule(
+        mode=os.environ.get('PROFILE_MODE', 'sample'),
+        requests=int(os.environ.get('PROFILE_REQUESTS', 0)),
+        seconds=float(os.environ.get('PROFILE_SECONDS', 0)),
+    )
@@ -0,0 +1,59 @@
+import csv
+import sys
+from array import array
+
+
+class Question:
+    __slots__ = ('id', 'theme', 'text', 'answer', 'wrong_answers')
+
+    def __init__(self, id, theme, text, answer, wrong_answers):
+        self.id = id
+        self.theme = theme
+        self.text = text
+        self.answer = answer
+        self.wrong_answers = wrong_answers
+
+
+class QuizBank:
+    """Вопросы викторины с целочисленными id и индексом тема -> массив id"""
+
+    def __init__(self, rows=()):
+        self.questions = []
+        self.themes = {}
+        for theme, text, answer, wrong_answers in rows:
+            self.add(theme, text, answer, wrong_answers)
+
+    def add(self, theme, text, answer, wrong_answers):
+        # Темы и варианты ответов повторяются, интернируем их, чтобы хранить по одной копии
+        theme = sys.intern(theme)
+        question = Question(len(self.questions), theme, text, sys.intern(answer),
+                            tuple(sys.intern(x) for x in wrong_answers))
+        self.questions.append(question)
+        ids = self.themes.get(theme)
+        if ids is None:
+            ids = self.themes[theme] = array('I')
+        ids.append(question.id)
+        return question
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __getitem__(self, question_id):
+        return self.questions[question_id]
+
+    def __contains__(self, theme):
+        return theme in self.themes
+
+    def question_at(self, theme, index):
+        return self.questions[self.themes[theme][index]]
+
+    def theme_size(self, theme):
+        return len(self.themes[theme])
+
+
+def load_quiz_bank(path='quiz.csv', encoding='windows-1251', quotechar=' '):
+    with open(path, 'r', encoding=encoding) as csvfile:
+        data = csv.DictReader(csvfile, delimiter=';', quotechar=quotechar)
+        return QuizBank(
+            (x['type'], x['question'], x['right_answer'], (x['wrong_answer1'], x['wrong_answer2'])) for x in data
+        )
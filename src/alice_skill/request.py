@@ -29,6 +29,10 @@ class Request:
     def command(self):
         return self.request_body['request']['command']
 
+    @property
+    def state(self):
+        return self.request_body.get('state', {}).get('session', {})
+
     @property
     def scene(self):
         return self.request_body['state']['session']['scene']
\ No newline at end of file
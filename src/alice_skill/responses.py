@@ -0,0 +1,191 @@
+import functools
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from alice_skill.codec import dumps
+from alice_skill.constants import STATE_RESPONSE_KEY
+
+# Ограничения Алисы на поля ответа, в символах
+TEXT_LIMIT = 1024
+TTS_LIMIT = 1024
+BUTTON_TITLE_LIMIT = 64
+CARD_TITLE_LIMIT = 128
+CARD_DESCRIPTION_LIMIT = 256
+
+# Допустимые кодировки ответа в порядке предпочтения, пустая строка выключает сжатие
+COMPRESSION = [x.strip() for x in os.environ.get('RESPONSE_COMPRESSION', 'br,gzip').split(',') if x.strip()]
+COMPRESS_MIN_SIZE = int(os.environ.get('RESPONSE_COMPRESS_MIN_SIZE', 1024))
+
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=5)
+
+
+COMPRESSORS = {'gzip': _gzip}
+if brotli is not None:
+    COMPRESSORS['br'] = _brotli
+
+
+class JsonResponse(bytes):
+    """Уже сериализованное тело ответа вебхука.
+
+    Сжатые варианты запоминаются в самом объекте, так что тело из шаблона сжимается один раз.
+    """
+
+    def compressed(self, encoding):
+        cache = self.__dict__.setdefault('_compressed', {})
+        body = cache.get(encoding)
+        if body is None:
+            body = cache[encoding] = COMPRESSORS[encoding](self)
+        return body
+
+
+def _truncate(value, limit):
+    if value is None or len(value) <= limit:
+        return value
+    return value[:limit - 1] + '…'
+
+
+def _compact_card(card):
+    changes = {}
+    for key, limit in (('title', CARD_TITLE_LIMIT), ('description', CARD_DESCRIPTION_LIMIT)):
+        value = card.get(key)
+        if value is not None and len(value) > limit:
+            changes[key] = _truncate(value, limit)
+    items = card.get('items')
+    if items:
+        compacted = [_compact_card(item) for item in items]
+        if any(new is not old for new, old in zip(compacted, items)):
+            changes['items'] = compacted
+    return dict(card, **changes) if changes else card
+
+
+def _compact_buttons(buttons):
+    titles = [button.get('title', '') for button in buttons]
+    # Обычный случай: заголовки непустые, разные и короткие, значит и кнопки разные
+    if all(titles) and len(set(titles)) == len(titles) and len(max(titles, key=len)) <= BUTTON_TITLE_LIMIT:
+        return buttons
+    result = None  # копия списка появляется, только если в нём что-то меняется
+    seen = set()
+    for i, button in enumerate(buttons):
+        payload = button.get('payload')
+        key = (button.get('title'), button.get('url'), button.get('hide'), None if payload is None else repr(payload))
+        # кнопку без заголовка Алиса не принимает
+        dropped = key in seen or not button.get('title')
+        too_long = len(button.get('title', '')) > BUTTON_TITLE_LIMIT
+        if (dropped or too_long) and result is None:
+            result = buttons[:i]
+        if dropped:
+            continue
+        seen.add(key)
+        if too_long:
+            button = dict(button, title=_truncate(button['title'], BUTTON_TITLE_LIMIT))
+        if result is not None:
+            result.append(button)
+    return buttons if result is None else result
+
+
+def compact(webhook_response):
+    """Ответ без лишнего и в пределах ограничений Алисы.
+
+    tts, совпадающий с text, не отправляется: без tts Алиса озвучивает text.
+    Одинаковые кнопки остаются в одном экземпляре, кнопки без заголовка убираются,
+    длинные строки обрезаются.
+    Если менять нечего, возвращается тот же объект.
+    """
+    response = webhook_response.get('response')
+    if not response:
+        return webhook_response
+    changes = {}
+    text = response.get('text')
+    tts = response.get('tts')
+    if tts is not None and tts == text:
+        changes['tts'] = None
+    elif tts is not None and len(tts) > TTS_LIMIT:
+        changes['tts'] = _truncate(tts, TTS_LIMIT)
+    if text is not None and len(text) > TEXT_LIMIT:
+        changes['text'] = _truncate(text, TEXT_LIMIT)
+    buttons = response.get('buttons')
+    if buttons:
+        compacted = _compact_buttons(buttons)
+        if compacted is not buttons:
+            changes['buttons'] = compacted
+    card = response.get('card')
+    if card:
+        compacted = _compact_card(card)
+        if compacted is not card:
+            changes['card'] = compacted
+    if not changes:
+        return webhook_response
+    response = dict(response, **changes)
+    if response.get('tts', '') is None:
+        del response['tts']
+    return dict(webhook_response, response=response)
+
+
+def encode_response(response):
+    if isinstance(response, JsonResponse):
+        return response
+    return JsonResponse(dumps(compact(response)))
+
+
+def negotiate(body, accept_encoding):
+    """(тело, Content-Encoding или None) для заголовка Accept-Encoding клиента"""
+    if not accept_encoding or not COMPRESSION or len(body) < COMPRESS_MIN_SIZE:
+        return body, None
+    accepted = set()
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(name.strip().lower())
+    for encoding in COMPRESSION:
+        if encoding in COMPRESSORS and (encoding in accepted or '*' in accepted):
+            if not isinstance(body, JsonResponse):
+                body = JsonResponse(body)
+            return body.compressed(encoding), encoding
+    return body, None
+
+
+class ResponseTemplate:
+    """Ответ, собранный один раз: при отдаче меняется только session_state"""
+
+    def __init__(self, webhook_response):
+        webhook_response = compact(webhook_response)
+        self.state = webhook_response[STATE_RESPONSE_KEY]
+        self._head = (b'{"response":' + dumps(webhook_response['response'])
+                      + b',"version":' + dumps(webhook_response['version'])
+                      + b',"' + STATE_RESPONSE_KEY.encode() + b'":')
+        self._body = JsonResponse(self._head + dumps(self.state) + b'}')
+
+    def render(self, state=None):
+        if not state:
+            return self._body
+        merged = dict(self.state)
+        merged.update(state)
+        return JsonResponse(self._head + dumps(merged) + b'}')
+
+
+def static_reply(build):
+    """Для ответов сцены, которые не зависят от запроса.
+
+    build вызывается один раз для каждого класса сцены, дальше отдаются готовые байты.
+    """
+    templates = {}
+
+    @functools.wraps(build)
+    def reply(self, *args):
+        template = templates.get(type(self))
+        if template is None:
+            template = templates[type(self)] = ResponseTemplate(build(self, *args))
+        return template.render()
+
+    return reply
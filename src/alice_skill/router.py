@@ -0,0 +1,103 @@
+ANY = None
+
+
+def _constant(scene):
+    def resolve(request):
+        return scene
+    return resolve
+
+
+class Router:
+    """Таблица переходов между сценами.
+
+    Ключ таблицы: (сцена, тип запроса, интент, значение слота), ANY в маршруте
+    означает «любая сцена» или «не важно». Сцены создаются один раз при регистрации,
+    поэтому обработчики не должны хранить состояние запроса в self.
+
+    nlu: функция request -> интенты в формате Алисы, к ней обращаемся,
+    когда Алиса не распознала в реплике ни одного интента.
+    """
+
+    def __init__(self, slot_name, nlu=None):
+        self.slot_name = slot_name
+        self.nlu = nlu
+        self.default = None
+        self._scenes = {}
+        self._sticky = set()
+        self._routes = []
+        self._table = None
+
+    def register(self, scene_cls=None, default=False, sticky=False):
+        """Регистрирует сцену. Можно использовать как декоратор, в том числе из других модулей.
+
+        sticky: сцена сама обрабатывает все реплики, пока из неё не уйдут.
+        """
+        def add(cls):
+            scene = cls()
+            self._scenes[cls.id()] = scene
+            if default:
+                self.default = scene
+            if sticky:
+                self._sticky.add(cls.id())
+            self._table = None
+            return cls
+
+        if scene_cls is None:
+            return add
+        return add(scene_cls)
+
+    def add_route(self, target, scene=ANY, request_type=ANY, intent=ANY, slot=ANY):
+        """Маршрут в target: класс сцены или функцию request -> сцена.
+
+        Маршруты конкретной сцены важнее маршрутов для ANY, среди интентов
+        выигрывает тот, маршрут которого добавлен раньше.
+        """
+        self._routes.append((scene, request_type, intent, slot, target))
+        self._table = None
+
+    def scene(self, scene_id):
+        return self._scenes.get(scene_id, self.default)
+
+    def __contains__(self, scene_id):
+        return scene_id in self._scenes
+
+    def __iter__(self):
+        return iter(self._scenes.values())
+
+    def _resolver(self, target):
+        if isinstance(target, type):
+            return _constant(self._scenes[target.id()])
+        return target
+
+    def compile(self):
+        table = {}
+        for priority, (scene, request_type, intent, slot, target) in enumerate(self._routes):
+            scene_ids = self._scenes if scene is ANY else [scene.id()]
+            for scene_id in scene_ids:
+                key = (scene_id, request_type, intent, slot)
+                if scene is ANY and key in table:
+                    continue
+                table[key] = (priority, self._resolver(target))
+        self._table = table
+        return table
+
+    def move(self, scene, request):
+        """Следующая сцена или None, если реплику не удалось разобрать"""
+        table = self._table or self.compile()
+        scene_id = scene.id()
+        route = table.get((scene_id, request.type, ANY, ANY))
+        if route is None:
+            intents = request.intents
+            if not intents and self.nlu is not None:
+                intents = self.nlu(request)
+            for intent in intents:
+                slot = intents[intent].get('slots', {}).get(self.slot_name, {}).get('value')
+                candidate = table.get((scene_id, ANY, intent, slot)) or table.get((scene_id, ANY, intent, ANY))
+                if candidate is not None and (route is None or candidate[0] < route[0]):
+                    route = candidate
+        if route is None:
+            return None
+        return route[1](request)
+
+    def is_sticky(self, scene_id):
+        return scene_id in self._sticky
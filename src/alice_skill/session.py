@@ -0,0 +1,250 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 10000
+LOCK_STRIPES = 64
+
+
+class SessionStore(ABC):
+    """Хранилище пользовательских сессий с TTL и вытеснением давно не использованных"""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.conflicts = 0
+
+    @abstractmethod
+    def get(self, key, default=None):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def set(self, key, value):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def pop(self, key, default=None):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def update(self, key, fn, default=None):
+        """Атомарно заменяет значение на fn(текущее или default) и возвращает новое.
+
+        Параллельные update одного ключа не теряют изменений друг друга,
+        разные ключи друг друга не ждут. fn может быть вызвана повторно.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def __len__(self):
+        raise NotImplementedError()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def stats(self):
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'conflicts': self.conflicts,
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """Хранилище внутри процесса: OrderedDict в порядке последнего обращения.
+
+    _lock защищает сам словарь и держится недолго. Запись ключа дополнительно
+    берёт одну из LOCK_STRIPES блокировок по хэшу ключа, под ней же выполняется fn в update,
+    так что медленный update одного пользователя не блокирует остальных.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, stripes=LOCK_STRIPES):
+        super().__init__(ttl, max_entries)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+
+    def _stripe(self, key):
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires < now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _set(self, key, value):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key, value):
+        with self._stripe(key):
+            self._set(key, value)
+
+    def pop(self, key, default=None):
+        with self._stripe(key), self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def update(self, key, fn, default=None):
+        with self._stripe(key):
+            value = fn(self.get(key, default))
+            self._set(key, value)
+            return value
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteSessionStore(SessionStore):
+    """Общее для всех воркеров хранилище в SQLite в режиме WAL.
+
+    Значения сериализуются pickle, у каждого потока своё соединение.
+    update не блокирует базу на время fn: у строки есть version, и запись проходит,
+    только если version не изменилась с момента чтения, иначе update повторяется.
+    """
+
+    SWEEP_EVERY = 256
+    MAX_RETRIES = 32
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        super().__init__(ttl, max_entries)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL, '
+                'version INTEGER NOT NULL DEFAULT 0)'
+            )
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(sessions)')]
+            if 'version' not in columns:
+                conn.execute('ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+            conn.execute('CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute('SELECT value, expires FROM sessions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        if row[1] < now:
+            conn.execute('DELETE FROM sessions WHERE key = ? AND expires < ?', (key, now))
+            self.expirations += 1
+            self.misses += 1
+            return default
+        conn.execute('UPDATE sessions SET accessed = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            'INSERT INTO sessions (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed, version = version + 1',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + self.ttl, now),
+        )
+        self._written()
+
+    def _written(self):
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            self.sweep()
+
+    def update(self, key, fn, default=None):
+        conn = self._connection()
+        for _ in range(self.MAX_RETRIES):
+            now = time.time()
+            row = conn.execute('SELECT value, expires, version FROM sessions WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] < now:
+                value = fn(default)
+            else:
+                value = fn(pickle.loads(row[0]))
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            if row is None:
+                written = conn.execute(
+                    'INSERT OR IGNORE INTO sessions (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                    (key, blob, now + self.ttl, now),
+                ).rowcount
+            else:
+                written = conn.execute(
+                    'UPDATE sessions SET value = ?, expires = ?, accessed = ?, version = version + 1 '
+                    'WHERE key = ? AND version = ?',
+                    (blob, now + self.ttl, now, key, row[2]),
+                ).rowcount
+            if written:
+                self._written()
+                return value
+            self.conflicts += 1
+        raise RuntimeError(f'Session {key!r} is updated concurrently too often')
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        self._connection().execute('DELETE FROM sessions WHERE key = ?', (key,))
+        return value
+
+    def sweep(self):
+        """Удаляет просроченные сессии и лишние сверх max_entries"""
+        conn = self._connection()
+        self.expirations += conn.execute('DELETE FROM sessions WHERE expires < ?', (time.time(),)).rowcount
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self.evictions += conn.execute(
+                'DELETE FROM sessions WHERE key IN (SELECT key FROM sessions ORDER BY accessed LIMIT ?)',
+                (excess,),
+            ).rowcount
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+
+def create_session_store():
+    ttl = int(os.environ.get('SESSION_TTL', DEFAULT_TTL))
+    max_entries = int(os.environ.get('SESSION_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    backend = os.environ.get('SESSION_BACKEND', 'memory')
+    if backend == 'memory':
+        return MemorySessionStore(ttl, max_entries)
+    elif backend == 'sqlite':
+        return SqliteSessionStore(os.environ.get('SESSION_DB', 'sessions.db'), ttl, max_entries)
+    raise ValueError(f'Unknown session backend: {backend}')
@@ -0,0 +1,234 @@
+import csv
+import heapq
+import math
+import threading
+from collections import OrderedDict, namedtuple
+
+EARTH_RADIUS = 6371000.0  # метры
+LEAF_SIZE = 8
+
+Venue = namedtuple('Venue', ['id', 'scene', 'city', 'name', 'lat', 'lon', 'tts', 'image_id'], defaults=('', ''))
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Расстояние по большому кругу в метрах"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _to_xyz(lat, lon):
+    phi = math.radians(lat)
+    lmb = math.radians(lon)
+    cos_phi = math.cos(phi)
+    return cos_phi * math.cos(lmb), cos_phi * math.sin(lmb), math.sin(phi)
+
+
+def _chord2(meters):
+    # Квадрат хорды единичной сферы, соответствующей дуге в meters
+    return (2 * math.sin(min(meters / EARTH_RADIUS, math.pi) / 2)) ** 2
+
+
+class VenueIndex:
+    """k-d дерево по точкам на единичной сфере.
+
+    Порядок по евклидовой длине хорды совпадает с порядком по haversine,
+    поэтому дерево отвечает точно, а расстояния считаются уже для найденных заведений.
+    """
+
+    def __init__(self, venues):
+        self.venues = list(venues)
+        self._points = [_to_xyz(v.lat, v.lon) for v in self.venues]
+        self._order = list(range(len(self.venues)))
+        self._build(0, len(self._order), 0)
+
+    def __len__(self):
+        return len(self.venues)
+
+    def __iter__(self):
+        return iter(self.venues)
+
+    def _build(self, lo, hi, depth):
+        if hi - lo <= LEAF_SIZE:
+            return
+        axis = depth % 3
+        points = self._points
+        self._order[lo:hi] = sorted(self._order[lo:hi], key=lambda i: points[i][axis])
+        mid = (lo + hi) // 2
+        self._build(lo, mid, depth + 1)
+        self._build(mid + 1, hi, depth + 1)
+
+    def _search(self, q, lo, hi, depth, visit, bound):
+        points = self._points
+        order = self._order
+        if hi - lo <= LEAF_SIZE:
+            for j in range(lo, hi):
+                i = order[j]
+                p = points[i]
+                d2 = (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2
+                visit(d2, i)
+            return
+        mid = (lo + hi) // 2
+        i = order[mid]
+        p = points[i]
+        axis = depth % 3
+        diff = q[axis] - p[axis]
+        visit((p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2, i)
+        if diff < 0:
+            near, far = (lo, mid), (mid + 1, hi)
+        else:
+            near, far = (mid + 1, hi), (lo, mid)
+        self._search(q, near[0], near[1], depth + 1, visit, bound)
+        if diff * diff <= bound():
+            self._search(q, far[0], far[1], depth + 1, visit, bound)
+
+    def _with_distance(self, lat, lon, indices):
+        result = []
+        for i in indices:
+            venue = self.venues[i]
+            result.append((venue, haversine(lat, lon, venue.lat, venue.lon)))
+        return result
+
+    def nearest(self, lat, lon, k=1):
+        """k ближайших заведений: список пар (venue, метры) по возрастанию расстояния"""
+        if not self.venues or k <= 0:
+            return []
+        heap = []  # max-heap по -d2
+
+        def visit(d2, i):
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, i))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, i))
+
+        def bound():
+            return -heap[0][0] if len(heap) == k else math.inf
+
+        self._search(_to_xyz(lat, lon), 0, len(self._order), 0, visit, bound)
+        indices = [i for _, i in sorted(heap, key=lambda item: -item[0])]
+        return self._with_distance(lat, lon, indices)
+
+    def within(self, lat, lon, radius):
+        """Заведения в радиусе radius метров, по возрастанию расстояния"""
+        limit = _chord2(radius)
+        found = []
+
+        def visit(d2, i):
+            if d2 <= limit:
+                found.append((d2, i))
+
+        self._search(_to_xyz(lat, lon), 0, len(self._order), 0, visit, lambda: limit)
+        found.sort()
+        return self._with_distance(lat, lon, [i for _, i in found])
+
+
+class NearestCache:
+    """Ближайшее заведение через кэш по ячейкам геохэша.
+
+    Для ячейки хранятся заведения, которые могут оказаться ближайшими хоть к одной её точке:
+    все, что от центра не дальше ближайшего плюс диагональ ячейки. Обычно это одно-два
+    заведения, и для точки запроса остаётся выбрать из них, так что ответ совпадает
+    с VenueIndex.nearest. Кэш принадлежит снимку контента и пропадает вместе с ним.
+
+    Ячейки те же, что у геохэша длины precision (около 150 м при 7), но ключом служат
+    номера полос по широте и долготе, без перемежения битов в строку.
+    """
+
+    def __init__(self, index, precision=7, max_entries=20000):
+        self.index = index
+        self.precision = precision
+        self.max_entries = max_entries
+        self._lat_cells = 1 << (5 * precision // 2)
+        self._lon_cells = 1 << ((5 * precision + 1) // 2)
+        self.cell_height = 180.0 / self._lat_cells
+        self.cell_width = 360.0 / self._lon_cells
+        self.hits = 0
+        self.misses = 0
+        self._cells = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, lat, lon):
+        return (min(int((lat + 90.0) / self.cell_height), self._lat_cells - 1),
+                min(int((lon + 180.0) / self.cell_width), self._lon_cells - 1))
+
+    def _candidates(self, key):
+        lat_lo = key[0] * self.cell_height - 90.0
+        lon_lo = key[1] * self.cell_width - 180.0
+        lat_hi = lat_lo + self.cell_height
+        lon_hi = lon_lo + self.cell_width
+        lat = lat_lo + self.cell_height / 2
+        lon = lon_lo + self.cell_width / 2
+        reach = max(haversine(lat, lon, corner_lat, corner_lon)
+                    for corner_lat in (lat_lo, lat_hi) for corner_lon in (lon_lo, lon_hi))
+        nearest = self.index.nearest(lat, lon)
+        if not nearest:
+            return ()
+        # +1 м на погрешность округления
+        return tuple(venue for venue, _ in self.index.within(lat, lon, nearest[0][1] + 2 * reach + 1))
+
+    def _cell(self, lat, lon):
+        key = self._key(lat, lon)
+        with self._lock:
+            candidates = self._cells.get(key)
+            if candidates is not None:
+                self._cells.move_to_end(key)
+                self.hits += 1
+                return candidates
+            self.misses += 1
+        return self._fill(key)
+
+    def _fill(self, key):
+        candidates = self._candidates(key)
+        with self._lock:
+            self._cells[key] = candidates
+            while len(self._cells) > self.max_entries:
+                self._cells.popitem(last=False)
+        return candidates
+
+    def nearest(self, lat, lon):
+        """(venue, метры) или None, если заведений нет"""
+        best = None
+        for venue in self._cell(lat, lon):
+            distance = haversine(lat, lon, venue.lat, venue.lon)
+            if best is None or distance < best[1]:
+                best = (venue, distance)
+        return best
+
+    def warm(self, lat_lo, lon_lo, lat_hi, lon_hi):
+        """Заполняет кэш для всех ячеек прямоугольника, не больше max_entries"""
+        first = self._key(lat_lo, lon_lo)
+        last = self._key(lat_hi, lon_hi)
+        count = 0
+        for row in range(first[0], last[0] + 1):
+            for column in range(first[1], last[1] + 1):
+                if count >= self.max_entries:
+                    return count
+                if (row, column) not in self._cells:
+                    self._fill((row, column))
+                count += 1
+        return count
+
+    def __len__(self):
+        return len(self._cells)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+def load_venues(path='venues.csv', encoding='utf-8'):
+    with open(path, 'r', encoding=encoding) as csvfile:
+        data = csv.DictReader(csvfile, delimiter=';')
+        return VenueIndex(
+            Venue(x['id'], x['scene'], x['city'], x['name'], float(x['lat']), float(x['lon']),
+                  x.get('tts') or '', x.get('image_id') or '')
+            for x in data
+        )
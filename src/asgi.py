@@ -0,0 +1,69 @@
+"""ASGI-точка входа с тем же контрактом /post, что и у Flask-приложения.
+
+    uvicorn asgi:application --app-dir src --host 0.0.0.0 --port 1337
+"""
+from modules.log.log import log_request
+from alice_skill import codec
+from alice_skill.dispatch import handle_async
+from alice_skill.metrics import METRICS
+from alice_skill.request import Request
+from alice_skill.responses import negotiate
+
+JSON_HEADERS = [(b'content-type', b'application/json')]
+
+
+async def _read_body(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+
+async def _send(send, status, body, headers=JSON_HEADERS):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers + [(b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    if METRICS.enabled and scope['path'] == '/metrics':
+        return await _send(send, 200, METRICS.render().encode(), [(b'content-type', b'text/plain; version=0.0.4')])
+    if scope['path'] != '/post':
+        return await _send(send, 404, b'Not Found', [(b'content-type', b'text/plain')])
+    if scope['method'] != 'POST':
+        return await _send(send, 405, b'Method Not Allowed', [(b'content-type', b'text/plain')])
+
+    try:
+        event = codec.loads(await _read_body(receive))
+    except codec.DecodeError:
+        event = None
+    if not isinstance(event, dict):
+        return await _send(send, 400, b'Bad Request', [(b'content-type', b'text/plain')])
+    log_request(event)
+    body = await handle_async(Request(event))
+    accept_encoding = next((value for name, value in scope['headers'] if name == b'accept-encoding'), b'')
+    body, encoding = negotiate(body, accept_encoding.decode('latin-1'))
+    if encoding is None:
+        return await _send(send, 200, body)
+    await _send(send, 200, body, JSON_HEADERS + [(b'content-encoding', encoding.encode()),
+                                                 (b'vary', b'Accept-Encoding')])
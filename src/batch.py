@@ -0,0 +1,107 @@
+"""Офлайн-прогон запросов Алисы через сцены навыка, без HTTP.
+
+    python src/batch.py requests.jsonl -o responses.jsonl --workers 4
+
+На входе JSONL с телами запросов вебхука, на выходе JSONL с ответами в том же порядке.
+Файл читается потоково, в работе одновременно не больше --inflight пачек по --chunk строк,
+поэтому память не зависит от размера входа. Ошибка в запросе не останавливает прогон:
+в соответствующую строку выхода пишется {"error": ...}, пустой строке тоже отвечает такая,
+так что N-я строка выхода всегда относится к N-й строке входа.
+
+Перед каждой пачкой random переинициализируется от --seed и номера пачки, поэтому
+курсоры викторины и весь выход при том же входе, --seed и --chunk не зависят ни от запуска, ни от --workers.
+"""
+import argparse
+import os
+import random
+import sys
+import types
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('LOG_REQUEST_BODY', 'off')
+
+from alice_skill import codec  # noqa: E402
+from alice_skill.dispatch import dispatch  # noqa: E402
+from alice_skill.request import Request  # noqa: E402
+from alice_skill.responses import encode_response  # noqa: E402
+
+
+def handle_line(line):
+    if not line.strip():
+        return codec.dumps({'error': 'empty line'})
+    try:
+        response = dispatch(Request(codec.loads(line)))
+        if isinstance(response, types.CoroutineType):
+            import asyncio
+            response = asyncio.run(response)
+        return bytes(encode_response(response))
+    except Exception as e:
+        return codec.dumps({'error': f'{type(e).__name__}: {e}'})
+
+
+def handle_chunk(lines, seed, index):
+    random.seed(f'{seed}:{index}')
+    return [handle_line(line) for line in lines]
+
+
+def _chunks(stream, size):
+    lines = iter(stream)
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(source, target, workers, chunk_size, inflight, seed=0):
+    count = 0
+    if workers == 0:
+        for index, chunk in enumerate(_chunks(source, chunk_size)):
+            for output in handle_chunk(chunk, seed, index):
+                target.write(output + b'\n')
+                count += 1
+        return count
+
+    with Pool(workers) as pool:
+        pending = deque()
+        for index, chunk in enumerate(_chunks(source, chunk_size)):
+            pending.append(pool.apply_async(handle_chunk, (chunk, seed, index)))
+            if len(pending) >= inflight:
+                for output in pending.popleft().get():
+                    target.write(output + b'\n')
+                    count += 1
+        while pending:
+            for output in pending.popleft().get():
+                target.write(output + b'\n')
+                count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='JSONL с запросами, - для stdin')
+    parser.add_argument('-o', '--output', default='-', help='JSONL с ответами, - для stdout')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='0 - без пула процессов')
+    parser.add_argument('--chunk', type=int, default=256, help='строк в одной пачке для воркера')
+    parser.add_argument('--inflight', type=int, default=0, help='пачек в работе, по умолчанию workers * 4')
+    parser.add_argument('--seed', type=int, default=0, help='seed для random, от него зависят курсоры викторины')
+    args = parser.parse_args()
+
+    inflight = args.inflight or max(1, args.workers) * 4
+    source = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    target = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        count = run(source, target, args.workers, args.chunk, inflight, args.seed)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if target is not sys.stdout.buffer:
+            target.close()
+    print(f'{count} responses', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
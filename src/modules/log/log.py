@@ -1,25 +1,143 @@
+import atexit
+import hashlib
+import json
 import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
 from werkzeug.serving import WSGIRequestHandler, _log
 
 
-log_level = "INFO"
+log_level = os.environ.get("LOG_LEVEL", "INFO")
 log_format = '[%(asctime)s] [%(levelname)s] "%(message)s"'
 date_format = "%d/%b/%Y:%H:%M:%S %z"
 
+# full | summary | off
+request_body_mode = os.environ.get("LOG_REQUEST_BODY", "summary")
+
+# Доля записей с полным payload, которые попадают в лог, по уровням: LOG_SAMPLE_INFO=0.01
+sample_rates = {
+    level: float(os.environ.get(f"LOG_SAMPLE_{logging.getLevelName(level)}", default))
+    for level, default in (
+        (logging.DEBUG, 1.0),
+        (logging.INFO, 1.0),
+        (logging.WARNING, 1.0),
+        (logging.ERROR, 1.0),
+        (logging.CRITICAL, 1.0),
+    )
+}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, date_format),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class PayloadSampler(logging.Filter):
+    """Пропускает только часть записей с extra={"payload": True}, остальные не трогает"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if not getattr(record, "payload", False):
+            return True
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class LazyQueueHandler(QueueHandler):
+    # QueueHandler форматирует сообщение ещё в потоке запроса, здесь это откладывается
+    # до потока QueueListener. Запись остаётся в том же процессе, так что args можно не копировать.
+    def prepare(self, record):
+        return record
+
+
 handler = logging.StreamHandler()
-formatter = logging.Formatter(log_format, date_format)
+if os.environ.get("LOG_FORMAT", "json") == "json":
+    formatter = JsonFormatter()
+else:
+    formatter = logging.Formatter(log_format, date_format)
 handler.setFormatter(formatter)
+
+log_queue = queue.SimpleQueue()
+queue_handler = LazyQueueHandler(log_queue)
+queue_handler.addFilter(PayloadSampler(sample_rates))
+listener = QueueListener(log_queue, handler, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
+
+
+def _restart_listener_in_child():
+    # Поток слушателя не переживает fork (воркеры gunicorn, пул процессов),
+    # а очередь могла остаться заблокированной им: в дочернем процессе создаём обе заново
+    new_queue = queue.SimpleQueue()
+    queue_handler.queue = new_queue
+    listener.queue = new_queue
+    listener._thread = None
+    listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_listener_in_child)
+
 # Adding to root in order to affect wsgi logs as well
 root = logging.getLogger()
-root.addHandler(handler)
+root.addHandler(queue_handler)
 
 logger = logging.getLogger("app")
 logger.setLevel(log_level)
 
 
+def request_summary(event):
+    """Тело запроса без персональных данных и текста реплики"""
+    request = event.get("request", {})
+    session = event.get("session", {})
+    user_id = session.get("user_id") or ""
+    return {
+        "user": hashlib.sha1(user_id.encode()).hexdigest()[:12],
+        "message_id": session.get("message_id"),
+        "type": request.get("type"),
+        "scene": event.get("state", {}).get("session", {}).get("scene"),
+        "intents": list(request.get("nlu", {}).get("intents", {})),
+        "command_length": len(request.get("command") or ""),
+        "has_location": "location" in session,
+    }
+
+
+class _LazySummary:
+    # Сводка считается при форматировании, то есть в потоке QueueListener и только для записей,
+    # которые пропустил PayloadSampler. Тело запроса навык не меняет, так что читать его позже безопасно.
+    __slots__ = ("event",)
+
+    def __init__(self, event):
+        self.event = event
+
+    def __str__(self):
+        return str(request_summary(self.event))
+
+
+def log_request(event):
+    if request_body_mode == "off" or not logger.isEnabledFor(logging.INFO):
+        return
+    if request_body_mode == "full":
+        logger.info("request %s", event, extra={"payload": True})
+    else:
+        logger.info("request %s", _LazySummary(event), extra={"payload": True})
+
+
 class MyRequestHandler(WSGIRequestHandler):
     def log(self, type, message, *args):
         _log(type, f"{self.address_string()} {message % args}\n")
 
     def log_request(self, code="-"):
-        self.log("info", f"{self.requestline} {code}")
\ No newline at end of file
+        self.log("info", f"{self.requestline} {code}")
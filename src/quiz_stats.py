@@ -0,0 +1,199 @@
+"""Статистика викторины по журналу событий (QUIZ_EVENT_LOG).
+
+    python src/quiz_stats.py quiz-events.bin [--quiz quiz.csv] [--version 3] [--json]
+
+Журнал отображается в память и разбирается целиком: с NumPy векторно, без него
+циклом по записям с array для счётчиков. По вопросам и темам печатаются показанные
+вопросы, правильные и неправильные ответы и точность, по темам ещё число прохождений,
+доля дошедших до конца и кривая отсева: какая доля прохождений ответила хотя бы на k вопросов.
+Прохождение - один старт темы одним пользователем, его задаёт пара (пользователь, seed курсора).
+
+id вопросов берутся из --quiz, поэтому он должен совпадать с файлом, который был у навыка
+при записи событий. После правки quiz.csv версия контента меняется, --version отфильтрует её события.
+"""
+import argparse
+import json
+import mmap
+import os
+import sys
+from array import array
+
+from alice_skill.events import ASKED, CORRECT, RECORD, WRONG
+from alice_skill.quiz_bank import load_quiz_bank
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _ratio(part, total):
+    return round(part / total, 4) if total else None
+
+
+def _theme_index(bank):
+    themes = sorted(bank.themes)
+    index = {theme: i for i, theme in enumerate(themes)}
+    return themes, [index[question.theme] for question in bank.questions]
+
+
+def _report(bank, themes, asked, correct, wrong, theme_runs, events, versions):
+    """Общий для обоих способов подсчёта вид результата: счётчики уже посчитаны по вопросам"""
+    questions = []
+    for question in bank.questions:
+        i = question.id
+        if asked[i] or correct[i] or wrong[i]:
+            questions.append({
+                'id': i,
+                'theme': question.theme,
+                'question': question.text,
+                'asked': int(asked[i]),
+                'correct': int(correct[i]),
+                'wrong': int(wrong[i]),
+                'accuracy': _ratio(correct[i], correct[i] + wrong[i]),
+            })
+    by_theme = []
+    for t, theme in enumerate(themes):
+        ids = bank.themes[theme]
+        theme_correct = sum(int(correct[i]) for i in ids)
+        theme_wrong = sum(int(wrong[i]) for i in ids)
+        answered = theme_runs.get(t, [])
+        runs = len(answered)
+        size = len(ids)
+        survival = [_ratio(sum(1 for n in answered if n >= k), runs) for k in range(1, size + 1)]
+        by_theme.append({
+            'theme': theme,
+            'asked': sum(int(asked[i]) for i in ids),
+            'correct': theme_correct,
+            'wrong': theme_wrong,
+            'accuracy': _ratio(theme_correct, theme_correct + theme_wrong),
+            'runs': runs,
+            'completed': _ratio(sum(1 for n in answered if n >= size), runs),
+            'survival': survival,
+        })
+    return {'events': events, 'versions': versions, 'questions': questions, 'themes': by_theme}
+
+
+def _dtype():
+    dtype = np.dtype([('time', '<f8'), ('user', '<u8'), ('question', '<u4'), ('seed', '<u4'),
+                      ('pos', '<u2'), ('version', '<u2'), ('kind', 'u1'), ('pad', 'V3')])
+    assert dtype.itemsize == RECORD.size
+    return dtype
+
+
+def aggregate_numpy(buffer, bank, version=None):
+    count = len(buffer) // RECORD.size
+    data = np.frombuffer(buffer, dtype=_dtype(), count=count)
+    versions = sorted(int(v) for v in np.unique(data['version']))
+    if version is not None:
+        data = data[data['version'] == version]
+    # события с id вопросов, которых нет в --quiz, относятся к другой версии файла
+    data = data[data['question'] < len(bank)]
+    n = len(bank)
+    kind = data['kind']
+    question = data['question']
+    asked = np.bincount(question[kind == ASKED], minlength=n)
+    correct = np.bincount(question[kind == CORRECT], minlength=n)
+    wrong = np.bincount(question[kind == WRONG], minlength=n)
+
+    themes, theme_of = _theme_index(bank)
+    theme_runs = {}
+    if len(data):
+        runs = np.empty(len(data), dtype=[('user', '<u8'), ('seed', '<u4')])
+        runs['user'] = data['user']
+        runs['seed'] = data['seed']
+        unique, inverse = np.unique(runs, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        # ответов в прохождении: позиция последнего правильного + 1
+        answered = np.zeros(len(unique), dtype=np.int64)
+        is_correct = kind == CORRECT
+        np.maximum.at(answered, inverse[is_correct], data['pos'][is_correct].astype(np.int64) + 1)
+        run_theme = np.zeros(len(unique), dtype=np.int64)
+        run_theme[inverse] = np.asarray(theme_of, dtype=np.int64)[question]
+        for t in np.unique(run_theme):
+            theme_runs[int(t)] = answered[run_theme == t].tolist()
+    return _report(bank, themes, asked, correct, wrong, theme_runs, int(count), versions)
+
+
+def aggregate_arrays(buffer, bank, version=None):
+    n = len(bank)
+    asked = array('L', [0]) * n
+    correct = array('L', [0]) * n
+    wrong = array('L', [0]) * n
+    counters = {ASKED: asked, CORRECT: correct, WRONG: wrong}
+    themes, theme_of = _theme_index(bank)
+    runs = {}
+    versions = set()
+    count = len(buffer) // RECORD.size
+    view = memoryview(buffer)[:count * RECORD.size]
+    for _, user, question, seed, pos, record_version, kind in RECORD.iter_unpack(view):
+        versions.add(record_version)
+        if (version is not None and record_version != version) or question >= n:
+            continue
+        counter = counters.get(kind)
+        if counter is not None:
+            counter[question] += 1
+        key = (user, seed)
+        theme, answered = runs.get(key, (theme_of[question], 0))
+        if kind == CORRECT and pos + 1 > answered:
+            answered = pos + 1
+        runs[key] = (theme, answered)
+    view.release()
+    theme_runs = {}
+    for theme, answered in runs.values():
+        theme_runs.setdefault(theme, []).append(answered)
+    return _report(bank, themes, asked, correct, wrong, theme_runs, count, sorted(versions))
+
+
+def aggregate(path, bank, version=None, use_numpy=True):
+    if os.path.getsize(path) < RECORD.size:
+        # пустой файл не отобразить в память
+        themes, _ = _theme_index(bank)
+        zeros = [0] * len(bank)
+        return _report(bank, themes, zeros, zeros, zeros, {}, 0, [])
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        if use_numpy and np is not None:
+            return aggregate_numpy(buffer, bank, version)
+        return aggregate_arrays(buffer, bank, version)
+
+
+def _print_report(report, out):
+    out.write(f'events: {report["events"]}, content versions: {report["versions"]}\n\n')
+    out.write(f'{"theme":<14} {"asked":>7} {"correct":>8} {"wrong":>7} {"accuracy":>9} {"runs":>6} {"completed":>10}\n')
+    for row in report['themes']:
+        out.write(f'{row["theme"]:<14} {row["asked"]:>7} {row["correct"]:>8} {row["wrong"]:>7} '
+                  f'{_percent(row["accuracy"]):>9} {row["runs"]:>6} {_percent(row["completed"]):>10}\n')
+    out.write('\nsurvival, share of runs with at least k correct answers:\n')
+    for row in report['themes']:
+        out.write(f'{row["theme"]:<14} ' + ' '.join(f'{_percent(x):>5}' for x in row['survival']) + '\n')
+    out.write(f'\n{"id":>4} {"theme":<14} {"asked":>7} {"correct":>8} {"wrong":>7} {"accuracy":>9}  question\n')
+    for row in sorted(report['questions'], key=lambda r: (r['accuracy'] is None, r['accuracy'])):
+        out.write(f'{row["id"]:>4} {row["theme"]:<14} {row["asked"]:>7} {row["correct"]:>8} {row["wrong"]:>7} '
+                  f'{_percent(row["accuracy"]):>9}  {row["question"][:60]}\n')
+
+
+def _percent(value):
+    return '-' if value is None else f'{value:.0%}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', help='файл журнала, QUIZ_EVENT_LOG навыка')
+    parser.add_argument('--quiz', default=os.environ.get('QUIZ_PATH', 'quiz.csv'))
+    parser.add_argument('--quiz-encoding', default=os.environ.get('QUIZ_ENCODING', 'windows-1251'))
+    parser.add_argument('--version', type=int, help='только события этой версии контента')
+    parser.add_argument('--no-numpy', action='store_true', help='считать без NumPy, даже если он установлен')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    bank = load_quiz_bank(args.quiz, args.quiz_encoding, os.environ.get('QUIZ_QUOTECHAR', ' '))
+    report = aggregate(args.log, bank, args.version, use_numpy=not args.no_numpy)
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=1)
+        sys.stdout.write('\n')
+    else:
+        _print_report(report, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,88 @@
-from flask import Flask, request
-from modules.log.log import logger
+import hmac
+import os
+
+from flask import Flask, Response, abort, jsonify, request
+from modules.log.log import log_request
+from alice_skill import codec
+from alice_skill.content import CONTENT
+from alice_skill.dispatch import handle
+from alice_skill.metrics import METRICS
+from alice_skill.profiler import PROFILER
 from alice_skill.request import Request
-from alice_skill.constants import STATE_REQUEST_KEY, QUEST, QUIZ
-from alice_skill.scenes import DEFAULT_SCENE, SCENES, Quiz, Quest
-application = Flask(__name__)
+from alice_skill.responses import JsonResponse, negotiate
+
+
+class SkillFlask(Flask):
+    def make_response(self, rv):
+        # Ответы из шаблонов уже сериализованы
+        if isinstance(rv, JsonResponse):
+            body, encoding = negotiate(rv, request.headers.get('Accept-Encoding'))
+            response = self.response_class(body, mimetype='application/json')
+            if encoding is not None:
+                response.headers['Content-Encoding'] = encoding
+                response.headers['Vary'] = 'Accept-Encoding'
+            return response
+        return super().make_response(rv)
+
+
+application = SkillFlask(__name__)
 
 
 @application.route('/post', methods=['POST'])
 def main():
-    logger.info(request.json)
-    event = request.json
-    req = Request(event)
-    current_scene_id = event.get('state').get(STATE_REQUEST_KEY).get('scene')
-
-    if current_scene_id is None:
-        return DEFAULT_SCENE().reply(req)
-    elif current_scene_id == QUIZ:
-        return Quiz().reply(req)
-    elif current_scene_id == QUEST:
-        return Quest().reply(req)
-
-    current_scene = SCENES.get(current_scene_id, DEFAULT_SCENE)()
-    next_scene = current_scene.move(req)
-    if next_scene is not None:
-        logger.info(f'Moving from scene {current_scene.id()} to {next_scene.id()}')
-        return next_scene.reply(req)
-    else:
-        logger.info(f'Failed to parse user request at scene {current_scene.id()}')
-        return current_scene.fallback()
+    try:
+        event = codec.loads(request.get_data())
+    except codec.DecodeError:
+        abort(400)
+    if not isinstance(event, dict):
+        abort(400)
+    log_request(event)
+    return handle(Request(event))
+
+
+@application.route('/healthz', methods=['GET'])
+def healthz():
+    return Response('ok', mimetype='text/plain')
+
+
+@application.route('/readyz', methods=['GET'])
+def readyz():
+    # Готовы, когда загружен контент: первый запрос не будет ждать чтения файлов
+    CONTENT.get()
+    return Response('ready', mimetype='text/plain')
+
+
+if METRICS.enabled:
+    @application.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+
+if PROFILE_TOKEN:
+    def _authorized():
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), PROFILE_TOKEN)
+
+    @application.route('/admin/profile', methods=['GET', 'POST', 'DELETE'])
+    def profile():
+        """POST ?mode=sample|cprofile&requests=N&seconds=T запускает сессию, DELETE завершает её досрочно"""
+        if not _authorized():
+            return Response('Forbidden', status=403, mimetype='text/plain')
+        if request.method == 'POST':
+            try:
+                PROFILER.start(
+                    mode=request.args.get('mode', 'sample'),
+                    requests=int(request.args.get('requests', 0)),
+                    seconds=float(request.args.get('seconds', 30)),
+                )
+            except ValueError as e:
+                return Response(str(e), status=400, mimetype='text/plain')
+            except RuntimeError as e:
+                return Response(str(e), status=409, mimetype='text/plain')
+        elif request.method == 'DELETE':
+            return jsonify(path=PROFILER.stop())
+        return jsonify(dict(PROFILER.status(), pid=os.getpid()))
 
 
 if __name__ == "__main__":